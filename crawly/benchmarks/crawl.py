@@ -0,0 +1,298 @@
+""" Crawl throughput of the crawly crawlers against a local synthetic web site.
+
+Every target runs in a fresh process against the same [web.SyntheticSite],
+itself served from another process, and reports:
+
+    pages/sec   urls fetched (pages and images) per second of crawl
+    MB/sec      body bytes fetched per second
+    p50 / p99   fetch latency; for base2 up to the first chunk, as it
+                reads the rest of the body later
+    peak RSS    of the crawling process
+
+The targets:
+
+    crawler     crawly.crawler.Crawler, the way base.crawl wires it
+    crawler2    crawler2's producers and consumers, the way crawler2.main wires them
+    base2       base2.bulk_crawl_and_write over every page of the site
+
+    python -m benchmarks.crawl [--targets crawler base2] [--pages 500] [--fan-out 8]
+                               [--page-size 16384] [--image-ratio 0.5] [--image-size 32768]
+                               [--latency 0.005] [--error-rate 0.0] [--duration 20]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.web import SyntheticSite, start_server
+
+
+TARGETS = ('crawler', 'crawler2', 'base2')
+
+
+class Measure(object):
+    """ What one crawl fetched, and how fast """
+
+    def __init__(self):
+        self.latencies = []
+        self.bytes = 0
+        self.errors = 0
+        self.begin = time.perf_counter()
+        self.end = None
+
+    def fetched(self, seconds, n_bytes=0, status=200):
+        self.latencies.append(seconds)
+        self.bytes += n_bytes
+        if status >= 400:
+            self.errors += 1
+
+    def failed(self, seconds):
+        self.latencies.append(seconds)
+        self.errors += 1
+
+    def stop(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+    def report(self):
+        self.stop()
+        elapsed = self.end - self.begin
+        return {
+            'fetched': len(self.latencies),
+            'errors': self.errors,
+            'seconds': elapsed,
+            'pages_per_sec': len(self.latencies) / elapsed,
+            'bytes_per_sec': self.bytes / elapsed,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            # kilobytes on Linux
+            'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        }
+
+
+async def no_input(crawler):
+    pass
+
+
+def quiet():
+    import logging
+    logging.disable(logging.CRITICAL)
+
+
+def crawl_crawler(base_url, expected, duration, measure: Measure):
+    from crawly.crawler import Crawler
+    from crawly.downloader import AsyncDownloaded
+    from crawly.seen import SeenAcceptor, SeenStore
+
+    class TimedDownloaded(AsyncDownloaded):
+        async def fetch(self, session=None):
+            begin = time.perf_counter()
+            await super().fetch(session)
+            if self.response is None:
+                measure.failed(time.perf_counter() - begin)
+            else:
+                measure.fetched(time.perf_counter() - begin,
+                                sum(len(chunk) for chunk in self.response.chunks),
+                                self.response.status_code)
+            return self
+
+    visited = [0]
+
+    def count(url, linked_by, crawler):
+        visited[0] += 1
+        if visited[0] >= expected:
+            measure.stop()
+            crawler.exit()
+        return True
+
+    async def timer(crawler):
+        await asyncio.sleep(duration)
+        measure.stop()
+        crawler.exit()
+
+    with tempfile.TemporaryDirectory() as output_path:
+        crawler = Crawler(inputs=[f'{base_url}/page/0'],
+                          input_loop=no_input,
+                          log_filepath='/dev/null',
+                          output_path=output_path,
+                          n_producers=1,
+                          n_downloaders=16,
+                          n_consumers=2,
+                          downloaded=TimedDownloaded,
+                          host_rate=0,
+                          host_concurrency=16,
+                          acceptors=[SeenAcceptor(SeenStore())],
+                          visitors=[count])
+        quiet()
+        crawler.tasks.append(crawler.loop.create_task(timer(crawler)))
+        measure.begin = time.perf_counter()
+        crawler.start()
+
+
+def crawl_crawler2(base_url, expected, duration, measure: Measure):
+    from crawly import crawler2
+    from crawly.seen import SeenStore
+
+    class TimedDownloaded(crawler2.Downloaded):
+        def init(self, url_identity, **kwargs):
+            begin = time.perf_counter()
+            try:
+                response = super().init(url_identity, **kwargs)
+            except Exception:
+                measure.failed(time.perf_counter() - begin)
+                raise
+            measure.fetched(time.perf_counter() - begin, len(response.content), response.status_code)
+            return response
+
+    crawler2.Downloaded = TimedDownloaded
+    quiet()
+    sys.stdout = open(os.devnull, 'w')     # crawler2 prints as it goes
+    visited = [0]
+    seen = SeenStore()
+
+    def count(url, linked_by, crawler):
+        visited[0] += 1
+        if visited[0] >= expected:
+            measure.stop()
+            crawler2.stop(crawler)
+        return True
+
+    async def timer(crawler):
+        await asyncio.sleep(duration)
+        measure.stop()
+        crawler2.stop(crawler)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    queue, queue_out = asyncio.Queue(), asyncio.Queue()
+    crawler = crawler2.Crawler(timeout=0.01,
+                               inputs=[f'{base_url}/page/0'],
+                               acceptors=[lambda url, linked_by, crawler: seen.add(url)],
+                               visitors=[count])
+
+    tasks = []
+    for i in range(2):
+        tasks.append(loop.create_task(crawler2.producer(str(i), queue, queue_out, crawler)))
+    for i in range(6):
+        tasks.append(loop.create_task(crawler2.consumer(str(i), queue, queue_out, crawler)))
+    tasks.append(loop.create_task(crawler2.initial(queue, crawler)))
+    tasks.append(loop.create_task(timer(crawler)))
+    measure.begin = time.perf_counter()
+    crawler2.start(loop, tasks, crawler)
+
+
+def crawl_base2(base_url, pages, duration, measure: Measure):
+    from crawly import base2
+    quiet()
+
+    fetch = base2.fetch
+
+    async def timed_fetch(identity, session, crawler, **kwargs):
+        begin = time.perf_counter()
+        try:
+            response, first = await fetch(identity, session, crawler, **kwargs)
+        except Exception:
+            measure.failed(time.perf_counter() - begin)
+            raise
+        measure.fetched(time.perf_counter() - begin,
+                        int(response.headers.get('Content-Length', len(first))),
+                        response.status)
+        return response, first
+
+    base2.fetch = timed_fetch
+    urls = {f'{base_url}/page/{i}' for i in range(pages)}
+
+    async def run(output_path):
+        crawler = base2.Crawler(output_path, 64 * 1024)
+        try:
+            await asyncio.wait_for(base2.bulk_crawl_and_write(file=f'{output_path}/found.urls',
+                                                              urls=urls,
+                                                              crawler=crawler),
+                                   duration)
+        except asyncio.TimeoutError:
+            pass
+        measure.stop()
+
+    with tempfile.TemporaryDirectory() as output_path:
+        measure.begin = time.perf_counter()
+        asyncio.run(run(output_path))
+
+
+def run_target(target, base_url, site_settings, duration, results):
+    measure = Measure()
+    site = SyntheticSite(**site_settings)
+    if target == 'crawler':
+        crawl_crawler(base_url, site.expected(), duration, measure)
+    elif target == 'crawler2':
+        crawl_crawler2(base_url, site.expected(), duration, measure)
+    elif target == 'base2':
+        crawl_base2(base_url, site.pages, duration, measure)
+    else:
+        raise ValueError(f'benchmarks.crawl: [target = {target}] is not one of {TARGETS}')
+    results.put((target, measure.report()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl a local synthetic web site and report throughput')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--pages', type=int, default=SyntheticSite.PAGES)
+    parser.add_argument('--fan-out', type=int, default=SyntheticSite.FAN_OUT)
+    parser.add_argument('--page-size', type=int, default=SyntheticSite.PAGE_SIZE)
+    parser.add_argument('--image-ratio', type=float, default=SyntheticSite.IMAGE_RATIO)
+    parser.add_argument('--image-size', type=int, default=SyntheticSite.IMAGE_SIZE)
+    parser.add_argument('--latency', type=float, default=SyntheticSite.LATENCY)
+    parser.add_argument('--error-rate', type=float, default=SyntheticSite.ERROR_RATE)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds a crawl may take at most')
+    args = parser.parse_args()
+
+    settings = {
+        'pages': args.pages,
+        'fan_out': args.fan_out,
+        'page_size': args.page_size,
+        'image_ratio': args.image_ratio,
+        'image_size': args.image_size,
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+    }
+    site = SyntheticSite(**settings)
+    print(f'{site}: {site.expected()} urls reachable')
+
+    server, port = start_server(settings)
+    base_url = f'http://127.0.0.1:{port}'
+    context = multiprocessing.get_context('spawn')
+    try:
+        for target in args.targets:
+            results = context.Queue()
+            process = context.Process(target=run_target, args=(target, base_url, settings, args.duration, results))
+            process.start()
+            try:
+                name, report = results.get(timeout=args.duration + 60)
+            finally:
+                process.join(5)
+                if process.is_alive():
+                    process.terminate()
+
+            print(f'{name:>10}: [pages/sec = {report["pages_per_sec"]:8.1f}]'
+                  f' [MB/sec = {report["bytes_per_sec"] / 2**20:7.2f}]'
+                  f' [p50 = {report["p50"] * 1000:7.1f} ms]'
+                  f' [p99 = {report["p99"] * 1000:7.1f} ms]'
+                  f' [peak RSS = {report["peak_rss"] / 2**20:6.1f} MB]'
+                  f' [fetched = {report["fetched"]}] [errors = {report["errors"]}]'
+                  f' [seconds = {report["seconds"]:.1f}]')
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
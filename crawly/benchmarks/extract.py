@@ -0,0 +1,66 @@
+""" Throughput of the three link extractors over a directory of saved html pages.
+
+    python -m benchmarks.extract [corpus_dir] [chunk_size]
+
+Without a corpus_dir a synthetic gallery-like corpus is generated.
+"""
+import pathlib
+import random
+import sys
+import time
+
+from crawly.extractor import stream_links, soup_links, regex_links
+
+
+def synthetic_corpus(n_pages=50, links_per_page=400):
+    random.seed(1)
+    pages = []
+    for page in range(n_pages):
+        parts = ['<!DOCTYPE html><html><head><title>gallery</title>'
+                 '<script>var x = "<a href=not-a-link>";</script></head><body>']
+        for i in range(links_per_page):
+            if i % 3:
+                parts.append(f'<div class="thumb"><a href="/gallery/{page}/{i}/" data-imageurl="/img/{i}.jpg">'
+                             f'picture {i}</a><p>{"lorem ipsum " * random.randrange(1, 20)}</p></div>')
+            else:
+                parts.append(f'<img src="https://cdn.example.com/{page}/{i}_620x.jpg" '
+                             f'data-src="/a/{i}.jpg|/b/{i}.jpg" alt="thumb {i}">')
+        parts.append('</body></html>')
+        pages.append(''.join(parts).encode('utf-8'))
+    return pages
+
+
+def load_corpus(path):
+    return [p.read_bytes() for p in sorted(pathlib.Path(path).rglob('*.htm*'))]
+
+
+def chunked(body, chunk_size):
+    for i in range(0, len(body), chunk_size):
+        yield body[i:i + chunk_size]
+
+
+def run(name, extract, pages):
+    begin = time.perf_counter()
+    links = 0
+    for body in pages:
+        for _ in extract(body):
+            links += 1
+    elapsed = time.perf_counter() - begin
+    size = sum(len(body) for body in pages)
+    print(f'{name:>7}: [MB/sec = {size / elapsed / 2**20:8.2f}]'
+          f' [pages/sec = {len(pages) / elapsed:9.1f}]'
+          f' [links = {links}]')
+
+
+def main(corpus=None, chunk_size=16 * 1024):
+    pages = load_corpus(corpus) if corpus else synthetic_corpus()
+    print(f'pages: {len(pages)}, bytes: {sum(len(body) for body in pages)}, chunk_size: {chunk_size}')
+
+    run('soup', lambda body: soup_links(body.decode('utf-8', 'replace')), pages)
+    run('regex', lambda body: regex_links(body.decode('utf-8', 'replace')), pages)
+    run('stream', lambda body: stream_links(chunked(body, chunk_size)), pages)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 16 * 1024)
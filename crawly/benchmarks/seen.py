@@ -0,0 +1,67 @@
+""" Memory per url and lookups/sec of the url-seen stores against a plain set.
+
+    python -m benchmarks.seen [n_urls]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from crawly.seen import SeenStore, BloomSeen
+
+
+def make_urls(n):
+    hosts = [f'www.host-{i}.com' for i in range(max(1, n // 1000))]
+    return [f'https://{random.choice(hosts)}/gallery/{i}/picture_{random.randrange(10**9)}.jpg?size=620x'
+            for i in range(n)]
+
+
+def fill(make, urls):
+    store = make()
+    for url in urls:
+        store.add(url)
+    if hasattr(store, 'merge'):
+        store.merge()
+    return store
+
+
+def measure(name, make, urls, probes):
+    begin = time.perf_counter()
+    store = fill(make, urls)
+    insert_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    found = 0
+    for url in probes:
+        if url in store:
+            found += 1
+    lookup_time = time.perf_counter() - begin
+    del store
+
+    tracemalloc.start()
+    store = fill(make, urls)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if isinstance(store, set):
+        # a set keeps the url strings themselves alive
+        memory += sum(sys.getsizeof(url) for url in urls)
+
+    print(f'{name:>10}: [bytes/url = {memory / len(urls):8.1f}]'
+          f' [inserts/sec = {len(urls) / insert_time:12,.0f}]'
+          f' [lookups/sec = {len(probes) / lookup_time:12,.0f}]'
+          f' [found = {found}/{len(probes)}]')
+
+
+def main(n_urls=1_000_000):
+    random.seed(1)
+    urls = make_urls(n_urls)
+    probes = random.sample(urls, min(len(urls), 100_000)) + make_urls(min(len(urls), 100_000))
+    print(f'urls: {n_urls}, probes: {len(probes)} (half of them unseen)')
+
+    measure('set', set, urls, probes)
+    measure('SeenStore', SeenStore, urls, probes)
+    measure('BloomSeen', lambda: BloomSeen(capacity=n_urls, error=0.001), urls, probes)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
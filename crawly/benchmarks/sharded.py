@@ -0,0 +1,86 @@
+""" Crawl throughput of sharding.Launcher for a growing number of shards.
+
+The [web.SyntheticSite] is spread over [hosts] loopback addresses, so
+the hosts hash to different shards and most links cross shards. Every
+run crawls the whole site and reports pages/sec and how many links
+went from shard to shard. The runs are cpu bound once the site is
+fast enough; the speedup is at most the number of cores there are.
+
+    python -m benchmarks.sharded [--shards 1 2 4] [--hosts 16] [--pages 2000] [--latency 0.005]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.web import SyntheticSite, start_server
+from crawly.sharding import Launcher
+
+
+def setup(shard, kwargs):
+    """ Counts the pages of each shard in a file, as a visitor can't be pickled to the shard processes """
+    counter = open(os.path.join(kwargs['output_path'], f'visited-{shard}'), 'w')
+
+    def count(url, linked_by, crawler):
+        counter.write('.')
+        return True
+
+    kwargs['visitors'] = [count]
+    kwargs['sinks'] = [counter]
+
+
+def visited(output_path):
+    return sum(os.path.getsize(os.path.join(output_path, name))
+               for name in os.listdir(output_path) if name.startswith('visited-'))
+
+
+def run(n_shards, base_url, duration):
+    with tempfile.TemporaryDirectory() as output_path:
+        launcher = Launcher([f'{base_url}/page/0'],
+                            n_shards=n_shards,
+                            capacity=1_000_000,
+                            duration=duration,
+                            setup=setup,
+                            settings={
+                                'log_filepath': os.devnull,
+                                'output_path': output_path,
+                                'n_downloaders': 16,
+                                'n_consumers': 2,
+                                'host_rate': 0,
+                                'host_concurrency': 16,
+                            })
+        begin = time.perf_counter()
+        totals = launcher.run()
+        elapsed = time.perf_counter() - begin
+        return launcher, totals, visited(output_path), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl a multi host synthetic site with 1..N crawler processes')
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--hosts', type=int, default=16)
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=SyntheticSite.LATENCY)
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds a crawl may take at most')
+    args = parser.parse_args()
+
+    settings = {'pages': args.pages, 'hosts': args.hosts, 'latency': args.latency}
+    site = SyntheticSite(**settings)
+    expected = site.expected()
+    print(f'{site}: {expected} urls reachable, [cpus = {os.cpu_count()}]')
+
+    server, port = start_server(settings)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        for n_shards in args.shards:
+            launcher, totals, pages, elapsed = run(n_shards, base_url, args.duration)
+            print(f'shards = {n_shards:2d}: [pages/sec = {pages / elapsed:8.1f}] [visited = {pages}/{expected}]'
+                  f' [fetches = {totals.get("fetches", 0)}] [forwarded = {totals.get("sent", 0)}]'
+                  f' [skipped = {totals.get("skipped", 0)}] [seconds = {elapsed:.1f}]')
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+""" A synthetic web site for the crawl benchmarks, served by aiohttp on localhost.
+
+Page i of [pages] links to [fan_out] others; [image_ratio] of those
+links are images instead. Every response waits [latency] seconds
+(exponentially distributed around it), and [error_rate] of them fail
+with a 503. Everything is derived from the page number, so two runs
+of the same settings serve the same graph.
+
+With [hosts] above 1, page and image t live on host 127.0.0.(1 + t % hosts)
+and links point there absolutely; the server listens on all of them.
+
+    python -m benchmarks.web [port]
+"""
+import asyncio
+import multiprocessing
+import random
+import socket
+import sys
+import time
+
+from aiohttp import web
+
+
+class SyntheticSite(object):
+    PAGES = 500
+    FAN_OUT = 8
+    PAGE_SIZE = 16 * 1024
+    IMAGE_RATIO = 0.5
+    IMAGE_SIZE = 32 * 1024
+    LATENCY = 0.005
+    ERROR_RATE = 0.0
+    HOSTS = 1
+
+    def __init__(self, **kwargs):
+        self.pages = kwargs.pop('pages', SyntheticSite.PAGES)
+        self.fan_out = kwargs.pop('fan_out', SyntheticSite.FAN_OUT)
+        self.page_size = kwargs.pop('page_size', SyntheticSite.PAGE_SIZE)
+        self.image_ratio = kwargs.pop('image_ratio', SyntheticSite.IMAGE_RATIO)
+        self.image_size = kwargs.pop('image_size', SyntheticSite.IMAGE_SIZE)
+        self.latency = kwargs.pop('latency', SyntheticSite.LATENCY)
+        self.error_rate = kwargs.pop('error_rate', SyntheticSite.ERROR_RATE)
+        self.hosts = kwargs.pop('hosts', SyntheticSite.HOSTS)
+        self.random = random.Random(kwargs.pop('seed', 1))
+        self.image = b'\xff\xd8\xff\xe0' + bytes(self.random.getrandbits(8) for _ in range(self.image_size - 4))
+
+    @property
+    def settings(self):
+        return {name: getattr(self, name) for name in
+                ('pages', 'fan_out', 'page_size', 'image_ratio', 'image_size', 'latency', 'error_rate', 'hosts')}
+
+    @property
+    def n_images(self):
+        return self.pages
+
+    def links(self, i):
+        """ The page and image paths page [i] links to """
+        n_images = round(self.fan_out * self.image_ratio)
+        for k in range(self.fan_out):
+            target = (i * 7 + k * 13 + 1) % self.pages
+            if k < n_images:
+                yield f'/img/{target}.jpg'
+            else:
+                yield f'/page/{target}'
+
+    def host_of(self, target):
+        return f'127.0.0.{1 + target % self.hosts}'
+
+    def addresses(self):
+        return [self.host_of(h) for h in range(self.hosts)]
+
+    def absolute(self, link, port):
+        """ [link] as an absolute url on the host it lives on; unchanged on a one host site """
+        if self.hosts == 1:
+            return link
+        target = int(link.rsplit('/', 1)[1].split('.', 1)[0])
+        return f'http://{self.host_of(target)}:{port}{link}'
+
+    def expected(self):
+        """ How many distinct urls a crawl from page 0 reaches """
+        seen, todo = {'/page/0'}, ['/page/0']
+        while todo:
+            path = todo.pop()
+            if path.startswith('/page/'):
+                for link in self.links(int(path.rsplit('/', 1)[1])):
+                    if link not in seen:
+                        seen.add(link)
+                        todo.append(link)
+        return len(seen)
+
+    def page(self, i, port=None):
+        anchors = ''.join(f'<a href="{self.absolute(link, port)}">{link}</a>\n' if link.startswith('/page/')
+                          else f'<img src="{self.absolute(link, port)}">\n' for link in self.links(i))
+        head = f'<html><head><title>page {i}</title></head><body>\n{anchors}'
+        padding = max(0, self.page_size - len(head) - 20)
+        return f'{head}<p>{"x" * padding}</p></body></html>'
+
+    async def respond(self, make):
+        if self.latency:
+            await asyncio.sleep(self.random.expovariate(1.0 / self.latency))
+        if self.error_rate and self.random.random() < self.error_rate:
+            return web.Response(status=503, text='unavailable')
+        return make()
+
+    async def handle_page(self, request):
+        i = int(request.match_info['i']) % self.pages
+        port = request.url.port
+        return await self.respond(lambda: web.Response(text=self.page(i, port), content_type='text/html'))
+
+    async def handle_image(self, request):
+        return await self.respond(lambda: web.Response(body=self.image, content_type='image/jpeg'))
+
+    async def handle_robots(self, request):
+        return web.Response(status=404)
+
+    def application(self):
+        app = web.Application()
+        app.router.add_get('/page/{i}', self.handle_page)
+        app.router.add_get('/img/{name}', self.handle_image)
+        app.router.add_get('/robots.txt', self.handle_robots)
+        return app
+
+    def __str__(self):
+        return 'SyntheticSite: ' + ' '.join(f'[{name} = {value}]' for name, value in self.settings.items())
+
+
+def serve(settings, port):
+    site = SyntheticSite(**settings)
+    web.run_app(site.application(), host=site.addresses(), port=port, print=None)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(settings, port=None, timeout=10.0):
+    """ Serves the site from a separate process, so it doesn't share a cpu with the crawler. Returns (process, port) """
+    port = port or free_port()
+    process = multiprocessing.get_context('spawn').Process(target=serve, args=(settings, port), daemon=True)
+    process.start()
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.1):
+                return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f'SyntheticSite: not serving on [port = {port}] after {timeout}s')
+
+
+if __name__ == '__main__':
+    site_port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    print(f'{SyntheticSite()} on http://127.0.0.1:{site_port}/page/0')
+    serve({}, site_port)
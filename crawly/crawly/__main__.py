@@ -0,0 +1,121 @@
+""" The crawly command line.
+
+    python -m crawly INPUTS OUTPUT_PATH [--storage mirror|content|archive] [--recrawl]
+                     [--producers 1] [--downloaders 3] [--consumers 3] [--no-uvloop]
+                     [--profile-startup] [--first-request-target 0.5]
+
+Only the standard library is imported until the arguments are parsed;
+the crawler and its dependencies (aiohttp, lxml, numpy, ...) come in
+when the crawl starts. uvloop runs the event loop when it is installed.
+--profile-startup reports on stderr how long each startup step took
+and when the first page request went out, against a target.
+"""
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+
+FIRST_REQUEST_TARGET = 0.5
+
+
+class StartupProfile(object):
+    """ Seconds since the command started, per startup step """
+
+    def __init__(self, target=FIRST_REQUEST_TARGET, started=STARTED):
+        self.target = target
+        self.started = started
+        self.marks = []
+        self.first = None
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter() - self.started))
+
+    def first_request(self):
+        if self.first is None:
+            self.mark('first request')
+            self.first = self.marks[-1][1]
+            self.report()
+
+    def report(self, out=None):
+        out = out or sys.stderr
+        previous = 0.0
+        for name, at in self.marks:
+            print(f'startup: [{name:<16}] [at = {at * 1000:7.1f} ms] [took = {(at - previous) * 1000:7.1f} ms]', file=out)
+            previous = at
+        if self.first is not None:
+            verdict = 'ok' if self.first <= self.target else 'over target'
+            print(f'startup: [time to first request = {self.first * 1000:.1f} ms]'
+                  f' [target = {self.target * 1000:.0f} ms] {verdict}', file=out)
+        out.flush()
+
+    def downloaded(self):
+        """ An AsyncDownloaded that marks the first fetch """
+        from crawly.downloader import AsyncDownloaded
+        profile = self
+
+        class ProfiledDownloaded(AsyncDownloaded):
+            async def fetch(self, session=None):
+                profile.first_request()
+                return await super().fetch(session)
+
+        return ProfiledDownloaded
+
+
+def use_uvloop():
+    """ Runs the crawl on uvloop if it is installed. Returns whether it is """
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    import asyncio
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def arguments(argv=None):
+    parser = argparse.ArgumentParser(prog='crawly', description='Crawl from the urls in INPUTS into OUTPUT_PATH')
+    parser.add_argument('inputs', help='a file of urls, one per line')
+    parser.add_argument('output_path')
+    parser.add_argument('--storage', choices=('mirror', 'content', 'archive'), default='mirror',
+                        help='a file per url, a content addressed store or WARC-like segments')
+    parser.add_argument('--recrawl', action='store_true', help='revalidate the pages of an earlier crawl')
+    parser.add_argument('--producers', type=int, default=1)
+    parser.add_argument('--downloaders', type=int, default=3)
+    parser.add_argument('--consumers', type=int, default=3)
+    parser.add_argument('--no-uvloop', action='store_true', help="use asyncio's own event loop")
+    parser.add_argument('--profile-startup', action='store_true', help='report import and time to first request')
+    parser.add_argument('--first-request-target', type=float, default=FIRST_REQUEST_TARGET,
+                        help='seconds from start to the first request that --profile-startup checks against')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = arguments(argv)
+    profile = StartupProfile(args.first_request_target) if args.profile_startup else None
+    if profile:
+        profile.mark('arguments')
+
+    uvloop = not args.no_uvloop and use_uvloop()
+    if profile:
+        profile.mark('uvloop' if uvloop else 'asyncio')
+
+    from crawly import base
+    if profile:
+        profile.mark('import crawly')
+
+    kwargs = {'downloaded': profile.downloaded()} if profile else {}
+    base.crawl(args.producers, args.consumers, args.downloaders,
+               # a path the crawler reads as a file of urls
+               os.path.abspath(args.inputs), args.output_path,
+               storage=args.storage,
+               recrawl=args.recrawl,
+               **kwargs)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
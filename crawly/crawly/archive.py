@@ -0,0 +1,293 @@
+import asyncio
+import collections
+import concurrent.futures
+import datetime
+import gzip
+import http
+import io
+import logging
+import os
+import zlib
+
+from crawly.downloader import Downloaded
+
+
+class ArchiveRecord(object):
+    """ One fetched resource as stored in a segment """
+
+    def __init__(self, url, status, headers, date, body, digest=None):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.date = date
+        self.body = body
+        self.digest = digest
+
+    def __str__(self):
+        return f'ArchiveRecord: [url = {self.url}] [status = {self.status}] [date = {self.date}] [length = {len(self.body)}]'
+
+
+# describe the bytes on the wire, not the decoded body a record stores
+TRANSFER_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+
+
+def record_head(download: Downloaded, payload_length, date):
+    """ The WARC and HTTP headers of a response record, up to the body.
+    The HTTP headers are those of the response as stored: decoded, [payload_length] bytes long """
+    response = download.response
+    try:
+        reason = http.HTTPStatus(response.status_code).phrase
+    except ValueError:
+        reason = ''
+    http_head = f'HTTP/1.1 {response.status_code} {reason}\r\n'
+    http_head += ''.join(f'{name}: {value}\r\n' for name, value in response.headers.items()
+                         if name.lower() not in TRANSFER_HEADERS)
+    http_head += f'Content-Length: {payload_length}\r\n'
+    http_head = (http_head + '\r\n').encode('utf-8', errors='replace')
+
+    warc_head = 'WARC/1.1\r\n' \
+                'WARC-Type: response\r\n' \
+                f'WARC-Target-URI: {download.identity.url}\r\n' \
+                f'WARC-Date: {date}\r\n' \
+                f'WARC-Payload-Digest: blake2b:{download.content_digest()}\r\n' \
+                'Content-Type: application/http;msgtype=response\r\n' \
+                f'Content-Length: {len(http_head) + payload_length}\r\n' \
+                '\r\n'
+    return warc_head.encode('utf-8', errors='replace') + http_head
+
+
+class ArchiveWriter(object):
+    """ Appends downloads to rolling, size capped segment files.
+
+    A segment [root]/[prefix]-00000.warc.gz holds WARC-like response
+    records, each one its own gzip member, so a reader can start
+    decompressing at any record. Once a segment reaches [max_size] the
+    next one is started. Next to it, [prefix]-00000.warc.gz.idx has one
+    'offset <tab> length <tab> url' line per record.
+
+    Records are compressed and appended on a thread of the writer's own,
+    in the order they were saved, so a large body does not stall the
+    event loop. Once [max_pending] records are queued [save_download]
+    awaits the oldest one. An error writing is logged and raised again
+    by [close].
+
+    An alternative to [save_download] / [mirror]:
+
+        archive = ArchiveWriter(output_path)
+        Crawler(..., download_handlers=[archive.save_download], sinks=[archive])
+    """
+
+    PREFIX = 'crawly'
+    MAX_SIZE = 256 * 1024 * 1024
+    LEVEL = 6
+    MAX_PENDING = 256
+
+    def __init__(self, root, **kwargs):
+        self.root = os.path.abspath(root)
+        self.prefix = kwargs.pop('prefix', ArchiveWriter.PREFIX)
+        self.max_size = kwargs.pop('max_size', ArchiveWriter.MAX_SIZE)
+        self.level = kwargs.pop('level', ArchiveWriter.LEVEL)
+        self.all_pages = kwargs.pop('all_pages', False)
+        self.max_pending = kwargs.pop('max_pending', ArchiveWriter.MAX_PENDING)
+
+        self.executor = None
+        self.writes = collections.deque()
+        self.error = None
+
+        self.number = -1
+        self.file = None
+        self.index = None
+        self.size = 0
+        self.records = 0
+        self.bytes_in = 0
+
+    @property
+    def path(self):
+        return os.path.join(self.root, f'{self.prefix}-{self.number:05d}.warc.gz')
+
+    def roll(self):
+        """ Closes the current segment and starts the next free one """
+        self.close_segment()
+        os.makedirs(self.root, exist_ok=True)
+        self.number += 1
+        while os.path.exists(self.path):
+            self.number += 1
+        self.file = open(self.path, 'wb')
+        self.index = open(f'{self.path}.idx', 'w')
+        self.size = 0
+
+    def write(self, download: Downloaded):
+        """ Appends [download] as one gzip member, right away. Returns (segment path, offset, length) """
+        if self.file is None or self.size >= self.max_size:
+            self.roll()
+
+        chunks = list(download.response.iter_content(chunk_size=download.chunk_size))
+        payload_length = sum(len(chunk) for chunk in chunks)
+        date = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        parts = [compressor.compress(record_head(download, payload_length, date))]
+        for chunk in chunks:
+            parts.append(compressor.compress(chunk))
+        parts.append(compressor.compress(b'\r\n\r\n'))
+        parts.append(compressor.flush())
+        member = b''.join(parts)
+
+        offset = self.size
+        self.file.write(member)
+        self.size += len(member)
+        self.index.write(f'{offset}\t{len(member)}\t{download.identity.url}\n')
+        self.records += 1
+        self.bytes_in += payload_length
+        return self.path, offset, len(member)
+
+    def thread(self):
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='archivewriter')
+        return self.executor
+
+    def submit(self, function, *args):
+        """ Runs [function] on the writer's thread, after the writes queued before it """
+        while self.writes and self.writes[0].done():
+            self.check(self.writes.popleft())
+        write = self.thread().submit(function, *args)
+        self.writes.append(write)
+        return write
+
+    async def room(self):
+        """ Waits, without blocking the loop, while [max_pending] writes are queued """
+        while len(self.writes) >= self.max_pending:
+            oldest = self.writes[0]
+            await asyncio.wrap_future(oldest)
+            if self.writes and self.writes[0] is oldest:
+                self.check(self.writes.popleft())
+
+    def check(self, write: concurrent.futures.Future):
+        error = write.exception()
+        if error is not None:
+            logging.error(f'ArchiveWriter: [root = {self.root}] write failed: {error!r}')
+            self.error = self.error or error
+
+    def wait(self):
+        """ Waits for every queued write """
+        while self.writes:
+            self.check(self.writes.popleft())
+
+    async def save_download(self, download: Downloaded, crawler=None):
+        """ Use as a crawler download handler """
+        if self.all_pages or download.identity.is_downloadable:
+            await self.room()
+            write = self.submit(self.write, download)
+            if crawler is not None:
+                write.add_done_callback(lambda done: self.written(download, done, crawler))
+        return True
+
+    def written(self, download: Downloaded, write: concurrent.futures.Future, crawler):
+        if not write.cancelled() and write.exception() is None:
+            path, offset, _ = write.result()
+            crawler.say(f'ArchiveWriter/save_download: [url = {download.identity.url}] [segment = {path}] [offset = {offset}]')
+
+    def close_segment(self):
+        if self.file is not None:
+            self.file.close()
+            self.index.close()
+            self.file = None
+            self.index = None
+
+    def disconnect(self):
+        self.wait()
+        self.close_segment()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def close(self):
+        """ Writes out whatever is queued and closes the segment; raises the first write error, if any """
+        await asyncio.get_running_loop().run_in_executor(None, self.disconnect)
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def __str__(self):
+        return f'ArchiveWriter: [root = {self.root}] [segment = {self.number}] [records = {self.records}]' \
+               f' [bytes_in = {self.bytes_in}]'
+
+
+def read_headers(stream):
+    """ 'Name: value' lines up to an empty one """
+    headers = {}
+    while True:
+        line = stream.readline()
+        if not line or line in (b'\r\n', b'\n'):
+            return headers
+        name, _, value = line.decode('utf-8', errors='replace').partition(':')
+        headers[name.strip()] = value.strip()
+
+
+def read_record(stream):
+    """ The next record of a decompressed segment [stream], or None at its end """
+    version = stream.readline()
+    while version in (b'\r\n', b'\n'):
+        version = stream.readline()
+    if not version:
+        return None
+
+    warc_headers = read_headers(stream)
+    block = stream.read(int(warc_headers.get('Content-Length', 0)))
+
+    block = io.BytesIO(block)
+    status_line = block.readline().decode('utf-8', errors='replace').split(' ', 2)
+    status = int(status_line[1]) if len(status_line) > 1 and status_line[1].isdigit() else 0
+    headers = read_headers(block)
+
+    digest = warc_headers.get('WARC-Payload-Digest', '')
+    return ArchiveRecord(warc_headers.get('WARC-Target-URI'),
+                         status,
+                         headers,
+                         warc_headers.get('WARC-Date'),
+                         block.read(),
+                         digest.partition(':')[2] or None)
+
+
+class ArchiveReader(object):
+    """ Reads the records of a segment back, one after the other or by offset """
+
+    def __init__(self, path):
+        self.path = path
+        self.index = None
+
+    def __iter__(self):
+        """ Streams every record of the segment, decompressing as it goes """
+        with gzip.open(self.path, 'rb') as stream:
+            while True:
+                record = read_record(stream)
+                if record is None:
+                    return
+                yield record
+
+    def read_at(self, offset):
+        """ The record whose gzip member starts at [offset] """
+        with open(self.path, 'rb') as fd:
+            fd.seek(offset)
+            with gzip.GzipFile(fileobj=fd, mode='rb') as stream:
+                return read_record(stream)
+
+    def load_index(self):
+        """ url -> (offset, length) out of the .idx file next to the segment """
+        if self.index is None:
+            self.index = {}
+            with open(f'{self.path}.idx') as fd:
+                for line in fd:
+                    offset, length, url = line.rstrip('\n').split('\t', 2)
+                    self.index[url] = (int(offset), int(length))
+        return self.index
+
+    def get(self, url):
+        """ The record of [url], found through the index; None if it isn't in this segment """
+        entry = self.load_index().get(url)
+        if entry is None:
+            return None
+        return self.read_at(entry[0])
+
+    def __str__(self):
+        return f'ArchiveReader: [path = {self.path}]'
@@ -1,9 +1,4 @@
 import asyncio
-import random
-import requests
-from bs4 import BeautifulSoup
-import lxml
-import re
 import urllib
 from urllib.parse import urlparse
 import pathlib
@@ -14,8 +9,8 @@ import urllib
 
 
 from crawly.identifier import Identified
-from crawly.parser import Parsed
 from crawly.downloader import Downloaded
+from crawly.sinks import SinkWriter, TextSink
 from crawly.crawler import *
 
 
@@ -132,6 +127,8 @@ visited_path = here.joinpath('visited.urls')
 config_path = here.joinpath('config.json')
 log_path = here.joinpath('crawly.log')
 
+visits = SinkWriter(TextSink(visited_path))
+
 
 history = set()
 
@@ -187,13 +184,7 @@ def save_download(download: Downloaded, crawler: Crawler):
 
 
 def register_url(url: str, linked_by: str, context: Crawler):
-    global visited_path
-
-    with open(visited_path, "a") as f:
-        f.write(f"{url}")
-        if linked_by:
-            f.write(f"\t{linked_by}")
-        f.write(f"\n")
+    visits.put((url, linked_by))
     return True
 
 
@@ -233,27 +224,56 @@ def crawl(n_producers,
           n_consumers,
           n_downloaders,
           inputs,
-          output_path):
-
-    crawler = Crawler(config=config_path,
-                      output_path=output_path,
-                      log_filepath=log_path,
-                      shutdown=shutdown,
-                      inputs=inputs,
-                      n_producers=n_producers,
-                      n_consumers=n_consumers,
-                      n_downloaders=n_downloaders,
-                      sleep_time=0.01,
-                      chunk_size=32*1024,
-                      parsing_handlers=[],
-                      download_handlers=[save_download],
-                      visitors=[register_url],
-                      acceptors=[
-                          history_accept,
-                          # deny_back,
-                      ],
-                      validators=[],
-                      )
+          output_path,
+          storage='mirror',
+          recrawl=False,
+          **kwargs):
+    """ [storage]: 'mirror' (a file per url), 'content' (ContentStore) or 'archive' (ArchiveWriter).
+    Any other [kwargs] go to the Crawler as they are """
+    # imported here, and the stores only when asked for, to keep importing this module cheap
+    from crawly.seen import SeenAcceptor, SeenStore
+    from crawly.metadata import MetaStore
+    from crawly.robots import Robots
+
+    download_handlers, sinks = [save_download], [visits]
+    if storage == 'content':
+        from crawly.storage import ContentStore
+        store = ContentStore(output_path)
+        download_handlers, sinks = [store.save_download], [visits, store]
+    elif storage == 'archive':
+        from crawly.archive import ArchiveWriter
+        archive = ArchiveWriter(os.path.join(output_path, 'archive'))
+        download_handlers, sinks = [archive.save_download], [visits, archive]
+
+    # kept on every run, so that a later one can recrawl
+    os.makedirs(output_path, exist_ok=True)
+    metadata = MetaStore(os.path.join(output_path, 'metadata.sqlite'))
+
+    settings = dict(config=config_path,
+                output_path=output_path,
+                log_filepath=log_path,
+                shutdown=shutdown,
+                inputs=inputs,
+                n_producers=n_producers,
+                n_consumers=n_consumers,
+                n_downloaders=n_downloaders,
+                chunk_size=32*1024,
+                parsing_handlers=[],
+                download_handlers=download_handlers,
+                visitors=[register_url],
+                sinks=sinks,
+                metadata=metadata,
+                recrawl=recrawl,
+                acceptors=[
+                    SeenAcceptor(SeenStore()),
+                    Robots(),
+                    # history_accept,
+                    # deny_back,
+                ],
+                validators=[],
+                )
+    settings.update(kwargs)
+    crawler = Crawler(**settings)
     crawler.start()
 
 
@@ -261,4 +281,8 @@ if __name__ == "__main__":
     import sys
     start_inputs = sys.argv[1]
     start_path = sys.argv[2]
-    crawl(1, 3, 3, start_inputs, start_path)
+    start_storage = 'mirror'
+    for storage_name in ('content', 'archive'):
+        if f'--{storage_name}' in sys.argv[3:]:
+            start_storage = storage_name
+    crawl(1, 3, 3, start_inputs, start_path, storage=start_storage, recrawl='--recrawl' in sys.argv[3:])
@@ -2,21 +2,21 @@
 # areq.py
 
 """Asynchronously get links embedded in multiple pages' HMTL."""
-import copy
 import asyncio
 import logging
-import re
 import sys
 from typing import IO
 import urllib.error
 import urllib.parse
 import os
+import pathlib
 
-import aiofiles
 import aiohttp
 from aiohttp import ClientSession
 
 from crawly.identifier import Identified
+from crawly.extractor import HREF_RE, SRC_RE, DATA_IMAGEURL_RE, DATA_SRC_RE
+from crawly.sinks import SinkWriter, TextSink
 
 logging.basicConfig(
     format="%(asctime)s %(levelname)s:%(name)s: %(message)s",
@@ -27,11 +27,6 @@ logging.basicConfig(
 logger = logging.getLogger("areq")
 logging.getLogger("chardet.charsetprober").disabled = True
 
-HREF_RE = re.compile(r'href="(.*?)"')
-SRC_RE = re.compile(r'src="(.*?)"')
-DATA_IMAGEURL_RE = re.compile(r'data-imageurl="(.*?)"')
-DATA_SRC_RE = re.compile(r'data-src="(.*?)"')
-
 
 class Crawler(object):
     def __init__(self, download_path: str, chunk_size: int):
@@ -39,18 +34,35 @@ class Crawler(object):
         self.chunk_size = chunk_size
 
 
-async def fetch_html(url: str, session: ClientSession, **kwargs) -> str:
-    """GET request wrapper to fetch page HTML.
+async def fetch(identity: Identified, session: ClientSession, crawler: Crawler, **kwargs):
+    """GET request that classifies `identity` out of the response
+    headers and the first chunk of the body.
 
     kwargs are passed to `session.request()`.
     """
-    kwargs2 = copy.deepcopy(kwargs)
-    kwargs2.pop('crawler')
-    resp = await session.request(method="GET", url=url, **kwargs2)
-    resp.raise_for_status()
-    logger.info("Got response [%s] for URL: %s", resp.status, url)
-    html = await resp.text()
-    return html
+    response = await session.request(method="GET", url=identity.url, **kwargs)
+    response.raise_for_status()
+    logger.info("Got response [%s] for URL: %s", response.status, identity.url)
+
+    first = await response.content.read(crawler.chunk_size)
+    identity.resolve(response.headers, first)
+    return response, first
+
+
+async def resolve(identity: Identified, session: ClientSession, **kwargs) -> None:
+    """HEAD request that classifies `identity` out of the response headers
+    alone. Left unresolved if it fails: the GET classifies it then."""
+    try:
+        async with session.head(identity.url, allow_redirects=True, **kwargs) as response:
+            response.raise_for_status()
+            identity.resolve(response.headers)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error("HEAD failed for %s [%s]: %s", identity.url, getattr(e, "status", None), e)
+
+
+async def read_text(response: aiohttp.ClientResponse, first: bytes) -> str:
+    rest = await response.content.read()
+    return (first + rest).decode(response.charset or 'utf-8', errors='replace')
 
 
 def gather_links(html, url):
@@ -92,54 +104,46 @@ def gather_links(html, url):
                 yield abslink
 
 
-async def parse(url: str, session: ClientSession, **kwargs) -> set:
-    """Find HREFs in the HTML of `url`."""
+async def parse(identity: Identified, response: aiohttp.ClientResponse, first: bytes) -> set:
+    """Find HREFs in the HTML of `identity`."""
     found = set()
-    try:
-        html = await fetch_html(url=url, session=session, **kwargs)
-    except (
-        aiohttp.ClientError,
-        aiohttp.http.HttpProcessingError
-    ) as e:
-        logger.error(
-            "aiohttp exception for %s [%s]: %s",
-            url,
-            getattr(e, "status", None),
-            getattr(e, "message", None),
-        )
-        return found
-    except Exception as e:
-        logger.exception(
-            "Non-aiohttp exception occured:  %s", getattr(e, "__dict__", {})
-        )
-        return found
-    else:
-        for link in gather_links(html, url):
-            found.add(link)
+    html = await read_text(response, first)
+    for link in gather_links(html, identity.url):
+        found.add(link)
+
+    logger.info("Found %d links for %s", len(found), identity.url)
+    return found
+
+
+async def download(identity: Identified, response: aiohttp.ClientResponse, first: bytes, crawler: Crawler):
+    dir_path, file_path = identity.host_paths(crawler.download_path)
+    logger.info(f"dir_path = [{dir_path}]; file_path = [{file_path}]")
 
-        logger.info("Found %d links for %s", len(found), url)
-        return found
+    if not pathlib.Path(file_path).exists():
+        os.makedirs(dir_path, exist_ok=True)
+        pathlib.Path(file_path).touch(exist_ok=True)
 
+        with open(file_path, 'wb') as fd:
+            fd.write(first)
+            while True:
+                chunk = await response.content.read(crawler.chunk_size)
+                if not chunk:
+                    break
+                fd.write(chunk)
 
-async def download(identity: Identified, session: ClientSession, crawler: Crawler, **kwargs):
+
+async def visit(identity: Identified, session: ClientSession, crawler: Crawler, parse_text=True, **kwargs) -> set:
+    """One GET per url: binaries are downloaded, text is parsed for links."""
+    the_links = set()
     try:
-        response = await session.request(method="GET", url=identity.url, **kwargs)
-        response.raise_for_status()
-        logger.info("Got response [%s] for URL: %s", response.status, identity.url)
-
-        dir_path, file_path = identity.host_paths(crawler.download_path)
-        logger.info(f"dir_path = [{dir_path}]; file_path = [{file_path}]")
-
-        if not pathlib.Path(file_path).exists():
-            os.makedirs(dir_path, exist_ok=True)
-            pathlib.Path(file_path).touch(exist_ok=True)
-
-            with open(file_path, 'wb') as fd:
-                while True:
-                    chunk = await response.content.read(crawler.chunk_size)
-                    if not chunk:
-                        break
-                    fd.write(chunk)
+        response, first = await fetch(identity, session, crawler, **kwargs)
+        try:
+            if not identity.is_text:
+                await download(identity, response, first, crawler)
+            elif parse_text:
+                the_links = await parse(identity, response, first)
+        finally:
+            response.release()
     except (
         aiohttp.ServerDisconnectedError,
         aiohttp.ClientError,
@@ -151,8 +155,11 @@ async def download(identity: Identified, session: ClientSession, crawler: Crawle
             getattr(e, "status", None),
             getattr(e, "message", None),
         )
-    else:
-        pass
+    except Exception as e:
+        logger.exception(
+            "Non-aiohttp exception occured:  %s", getattr(e, "__dict__", {})
+        )
+    return the_links
 
 
 def is_forbidden_link(link):
@@ -165,43 +172,41 @@ def is_forbidden_link(link):
     return False
 
 
-async def handle_url(file: IO, url: str, **kwargs) -> set:
-    identity = Identified(url)
+async def handle_url(file: IO, url: str, session: ClientSession, crawler: Crawler, **kwargs) -> set:
+    the_links = await visit(Identified(url), session, crawler, **kwargs)
 
-    if not identity.is_text:
-        the_links = set()
-        await download(identity=identity, **kwargs)
-    else:
-        the_links = await parse(url=url, **kwargs)
-        for link in the_links:
-            if not is_forbidden_link(link):
-                link_id = Identified(link)
-                if not link_id.is_text:
-                    await download(identity=link_id, **kwargs)
+    for link in the_links:
+        if not is_forbidden_link(link):
+            link_id = Identified(link)
+            if link_id.content_type is None:
+                # no extension to go by: pages aren't fetched here, only what they link to
+                await resolve(link_id, session, **kwargs)
+            if not link_id.is_text:
+                await visit(link_id, session, crawler, parse_text=False, **kwargs)
     return the_links
 
 
-async def write_one(file: IO, url: str, **kwargs) -> None:
-    """Write the found HREFs from `url` to `file`."""
+async def write_one(file: IO, url: str, writer: SinkWriter, **kwargs) -> None:
+    """Queue the found HREFs from `url` for `writer`."""
 
     res = await handle_url(file=file, url=url, **kwargs)
     if not res:
         return None
-    async with aiofiles.open(file, "a") as f:
-        for p in res:
-            await f.write(f"{url}\t{p}\n")
-        logger.info("Wrote results for source URL: %s", url)
+    writer.put_many((url, p) for p in res)
+    logger.info("Queued results for source URL: %s", url)
 
 
 async def bulk_crawl_and_write(file: IO, urls: set, **kwargs) -> None:
     """Crawl & write concurrently to `file` for multiple `urls`."""
+    writer = SinkWriter(TextSink(file))
     async with ClientSession() as session:
         tasks = []
         for url in urls:
             tasks.append(
-                write_one(file=file, url=url, session=session, **kwargs)
+                write_one(file=file, url=url, session=session, writer=writer, **kwargs)
             )
         await asyncio.gather(*tasks)
+    await writer.close()
 
 if __name__ == "__main__":
     import pathlib
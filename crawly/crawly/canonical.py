@@ -0,0 +1,154 @@
+import functools
+from urllib.parse import urlsplit, urlunsplit
+
+
+TRACKING_PARAMS = {
+    'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'ref_src', 'spm',
+}
+
+TRACKING_PREFIXES = ('utm_',)
+
+DEFAULT_PORTS = {
+    'http': 80,
+    'https': 443,
+}
+
+
+def remove_dot_segments(path):
+    """ RFC 3986, section 5.2.4 """
+    if '.' not in path:
+        return path
+    output = []
+    for segment in path.split('/'):
+        if segment == '..':
+            if len(output) > 1:
+                output.pop()
+        elif segment != '.':
+            output.append(segment)
+    if path.endswith(('/.', '/..')):
+        output.append('')
+    return '/'.join(output)
+
+
+def collapse_slashes(path):
+    while '//' in path:
+        path = path.replace('//', '/')
+    return path
+
+
+class Canonicalizer(object):
+    """ Resolves and normalizes a page's whole batch of links in one call.
+
+    Links are joined against the page url, then lower-cased in scheme and
+    host, stripped of default ports, fragments, duplicate slashes and
+    tracking query parameters, and the query is sorted. Links that are
+    not http(s) are dropped, and so are the repeats within the batch;
+    [duplicates] counts the latter. """
+
+    SCHEMES = ('http', 'https')
+    CACHE_SIZE = 1024
+
+    def __init__(self, **kwargs):
+        self.schemes = kwargs.pop('schemes', Canonicalizer.SCHEMES)
+        self.tracking_params = kwargs.pop('tracking_params', TRACKING_PARAMS)
+        self.tracking_prefixes = kwargs.pop('tracking_prefixes', TRACKING_PREFIXES)
+        self.sort_query = kwargs.pop('sort_query', True)
+
+        cache_size = kwargs.pop('cache_size', Canonicalizer.CACHE_SIZE)
+        self.parse_base = functools.lru_cache(maxsize=cache_size)(urlsplit)
+        self.canonical_netloc = functools.lru_cache(maxsize=cache_size)(self.netloc)
+        self.links = 0
+        self.duplicates = 0
+
+    def is_tracking(self, param):
+        key = param.split('=', 1)[0].lower()
+        return key in self.tracking_params or key.startswith(self.tracking_prefixes)
+
+    def query(self, query):
+        if not query:
+            return ''
+        params = [param for param in query.split('&') if param and not self.is_tracking(param)]
+        if self.sort_query:
+            params.sort()
+        return '&'.join(params)
+
+    @staticmethod
+    def netloc(scheme, netloc):
+        split = urlsplit('//' + netloc)
+        host = split.hostname
+        if not host:
+            return ''
+        host = host.rstrip('.')
+        if ':' in host:
+            host = f'[{host}]'
+        try:
+            port = split.port
+        except ValueError:
+            return ''
+        if port and port != DEFAULT_PORTS.get(scheme):
+            host = f'{host}:{port}'
+        if split.username is not None:
+            userinfo = split.username
+            if split.password is not None:
+                userinfo = f'{userinfo}:{split.password}'
+            host = f'{userinfo}@{host}'
+        return host
+
+    def resolve(self, base, link):
+        """ RFC 3986, section 5.2.2; [base] is already split """
+        split = urlsplit(link)
+        if split.scheme:
+            return split.scheme.lower(), split, split.path, split.query
+
+        scheme = base.scheme.lower()
+        if link.startswith('//'):
+            return scheme, split, split.path, split.query
+
+        if not split.path:
+            return scheme, base, base.path, split.query if split.query else base.query
+
+        if split.path.startswith('/'):
+            path = split.path
+        elif base.netloc and not base.path:
+            path = '/' + split.path
+        else:
+            path = base.path[0:base.path.rfind('/') + 1] + split.path
+        return scheme, base, path, split.query
+
+    def canonical(self, link, base):
+        link = link.strip()
+        if not link:
+            return ''
+        try:
+            scheme, authority, path, query = self.resolve(base, link)
+            if scheme not in self.schemes:
+                return ''
+            netloc = self.canonical_netloc(scheme, authority.netloc)
+        except ValueError:
+            return ''
+        if not netloc:
+            return ''
+
+        path = remove_dot_segments(collapse_slashes(path)) or '/'
+        return urlunsplit((scheme, netloc, path, self.query(query), ''))
+
+    def __call__(self, links, base_url):
+        """ Canonical, unique, http(s) links out of [links] found on [base_url] """
+        base = self.parse_base(base_url)
+        unique = {}
+        for link in links:
+            if not link:
+                continue
+            canonical = self.canonical(link, base)
+            if not canonical:
+                continue
+            self.links += 1
+            if canonical in unique:
+                self.duplicates += 1
+                continue
+            unique[canonical] = True
+        return list(unique)
+
+    def __str__(self):
+        return f'Canonicalizer: [links = {self.links}] [duplicates = {self.duplicates}]'
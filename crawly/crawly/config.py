@@ -1,6 +1,5 @@
 import json
 import os
-from python_json_config import ConfigBuilder
 
 
 class Builder(object):
@@ -48,25 +47,31 @@ class Config(dict):
         return f"Config: " + super().__str__()
 
 
-config = Config()
-print(f"config: {config._value}", end="\n\n")
+def demo():
+    """ What Config does with nested values; only run as a script """
+    config = Config()
+    print(f"config: {config._value}", end="\n\n")
 
-config.test = Config(1)
-print(f"config/test: {config.test._value}", end="\n\n")
+    config.test = Config(1)
+    print(f"config/test: {config.test._value}", end="\n\n")
 
-config.test.one = Config('TEST ME')
-print(f"config/test/one: {config.test.one._value}", end="\n\n")
+    config.test.one = Config('TEST ME')
+    print(f"config/test/one: {config.test.one._value}", end="\n\n")
 
-config.test.two = Config('How to test me')
-print(f"config/test/two: {config.test.two._value}", end="\n\n")
+    config.test.two = Config('How to test me')
+    print(f"config/test/two: {config.test.two._value}", end="\n\n")
 
-config.test.two.one = Config('Hello')
-print(f"config/test/two/one: {config.test.two.one._value}", end="\n\n")
+    config.test.two.one = Config('Hello')
+    print(f"config/test/two/one: {config.test.two.one._value}", end="\n\n")
 
-exit(0)
+    from python_json_config import ConfigBuilder
 
-builder = ConfigBuilder()
-config = builder.parse('../config.json')
+    builder = ConfigBuilder()
+    config = builder.parse('../config.json')
 
-print(f"config/crawler/chunk_size: {config.data['crawler']['chunk_size']}")
-print(f"config/crawler/sleep_time: {config.data['crawler']['chunk_size']}")
\ No newline at end of file
+    print(f"config/crawler/chunk_size: {config.data['crawler']['chunk_size']}")
+    print(f"config/crawler/sleep_time: {config.data['crawler']['chunk_size']}")
+
+
+if __name__ == '__main__':
+    demo()
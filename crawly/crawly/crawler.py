@@ -1,4 +1,6 @@
+import collections
 import datetime
+import inspect
 import signal
 
 import logging
@@ -8,32 +10,63 @@ import time
 
 import asyncio
 import aioconsole
+import aiohttp
 
 import urllib.error
 import urllib.parse
 
 from .identifier import Identified
-from .downloader import Downloaded
-from .parser import Parsed
+from .downloader import Downloaded, AsyncDownloaded
+from .frontier import Frontier
+from .canonical import Canonicalizer
+from .extractor import EXTRACTORS, regex_links
+from .parsing import ParserPool
+from .flow import WatermarkQueue, Backlog
 
 
 class Crawler(object):
-    SLEEP_TIME = 0.01
+    PARSE_QUEUE_SIZE = 64
+    QUEUE_SIZE = 1024
+    FRONTIER_HIGH = 10000
+    ADMISSION_TIMEOUT = 1.0
+    REFILL_SIZE = 256
+    LATENCY_WEIGHT = 0.2
+    USER_AGENT = 'crawly'
 
     def __init__(self, **kwargs):
         self.config = kwargs.pop('config', '')
         self.log_filepath = kwargs.pop('log_filepath', 'example.log')
         self.output_path = kwargs.pop('output_path', '../output')
 
-        self.sleep_time = kwargs.pop('sleep_time', Crawler.SLEEP_TIME)
         self.n_producers = kwargs.pop('n_producers', 1)
         self.n_consumers = kwargs.pop('n_consumers', 1)
         self.n_downloaders = kwargs.pop('n_downloaders', 1)
 
+        self.host_rate = kwargs.pop('host_rate', Frontier.HOST_RATE)
+        self.host_burst = kwargs.pop('host_burst', Frontier.HOST_BURST)
+        self.host_concurrency = kwargs.pop('host_concurrency', Frontier.HOST_CONCURRENCY)
+
+        self.queue_size = kwargs.pop('queue_size', Crawler.QUEUE_SIZE)
+        self.frontier_high = kwargs.pop('frontier_high', Crawler.FRONTIER_HIGH)
+        self.frontier_low = kwargs.pop('frontier_low', None)
+        self.admission_timeout = kwargs.pop('admission_timeout', Crawler.ADMISSION_TIMEOUT)
+        self.backlog = Backlog(kwargs.pop('backlog_path', None))
+        self.refill_size = kwargs.pop('refill_size', Crawler.REFILL_SIZE)
+        self.refill = kwargs.pop('refill', refill)
+        self.throttled = 0
+        self.overflowed = 0
+
         self.parsing_handlers = kwargs.pop('parsing_handlers', [])
         self.download_handlers = kwargs.pop('download_handlers', [])
 
+        # sent with every request; robots.txt rules are chosen by it too
+        self.user_agent = kwargs.pop('user_agent', Crawler.USER_AGENT)
         self.chunk_size = kwargs.pop('chunk_size', Downloaded.DEFAULT_CHUNK_SIZE)
+        self.downloaded = kwargs.pop('downloaded', AsyncDownloaded)
+        self.extractor = kwargs.pop('extractor', 'stream')
+        if self.extractor not in EXTRACTORS:
+            raise ValueError(f"Crawler: [extractor = {self.extractor}] is not one of {EXTRACTORS}")
+        self.session = None
         self.loop = None
         self.queue = None
         self.queue_down = None
@@ -56,9 +89,31 @@ class Crawler(object):
         self.downloader = kwargs.pop('downloader', downloader)
         self.downloader_tasks = []
 
+        self.metadata = kwargs.pop('metadata', None)
+        self.recrawl = kwargs.pop('recrawl', False)
+        self.revalidated = 0
+
+        self.autoscaler = kwargs.pop('autoscaler', None)
+        # router(records, crawler) -> the records this crawler keeps, e.g. a sharding.Sharder
+        self.router = kwargs.pop('router', None)
+        self.spawned = collections.Counter()
+        self.idle = set()
+        self.retiring = set()
+        self.held = set()     # tasks of urls waiting on an acceptor, see [hold]
+        self.fetches = 0
+        self.errors = 0
+        self.latency = 0.0
+
         self.link_cleaners = kwargs.pop('cleaners', [])
+        self.canonicalizer = kwargs.pop('canonicalizer', Canonicalizer())
+
+        self.n_parsers = kwargs.pop('n_parsers', ParserPool.N_WORKERS)
+        self.parse_batch_size = kwargs.pop('parse_batch_size', ParserPool.BATCH_SIZE)
+        self.parse_queue_size = kwargs.pop('parse_queue_size', Crawler.PARSE_QUEUE_SIZE)
+        self.parsers = None
         self.link_validators = kwargs.pop('validators', [])
         self.visitors = kwargs.pop('visitors', [])
+        self.sinks = kwargs.pop('sinks', [])
         self.acceptors = kwargs.pop('acceptors', [])
 
         self.producers_quit = False
@@ -79,28 +134,37 @@ class Crawler(object):
 
         self.loop = asyncio.get_event_loop()
 
-        self.queue_urls: asyncio.Queue = asyncio.Queue()    # format: (link, contained_by)
-        self.queue_down: asyncio.Queue = asyncio.Queue()
-        self.queue: asyncio.Queue = asyncio.Queue()
+        self.queue_urls: WatermarkQueue = WatermarkQueue(maxsize=self.queue_size)    # format: (link, contained_by)
+        self.queue_down: Frontier = Frontier(host_rate=self.host_rate,
+                                             host_burst=self.host_burst,
+                                             host_concurrency=self.host_concurrency,
+                                             high=self.frontier_high,
+                                             low=self.frontier_low)
+        self.queue: WatermarkQueue = WatermarkQueue(maxsize=self.parse_queue_size,
+                                                    high=self.parse_queue_size,
+                                                    low=self.parse_queue_size - 1)
+
+        if self.n_parsers:
+            self.parsers = ParserPool(n_workers=self.n_parsers,
+                                      batch_size=self.parse_batch_size,
+                                      extractor=self.extractor,
+                                      canonicalizer=self.canonicalizer)
 
         self.tasks = []
         self.input_task: asyncio.Task = self.loop.create_task(self.input_loop(self))
 
-        for i in range(self.n_producers):
-            task = self.loop.create_task(self.producer(str(i), self))
-            self.tasks.append(task)
-            self.producer_tasks.append(task)
+        for _ in range(self.n_producers):
+            self.spawn('producer')
 
-        for i in range(self.n_downloaders):
-            task = self.loop.create_task(self.downloader(str(i), self))
-            self.tasks.append(task)
-            self.downloader_tasks.append(task)
+        for _ in range(self.n_downloaders):
+            self.spawn('downloader')
 
-        for i in range(self.n_consumers):
-            task = self.loop.create_task(self.consumer(str(i), self))
-            self.tasks.append(task)
-            self.consumer_tasks.append(task)
+        for _ in range(self.n_consumers):
+            self.spawn('consumer')
 
+        self.tasks.append(self.loop.create_task(self.refill(self)))
+        if self.autoscaler is not None:
+            self.tasks.append(self.loop.create_task(self.autoscaler.run(self)))
         self.tasks.append(self.loop.create_task(initial(self.inputs, self)))
 
     def start(self):
@@ -122,12 +186,143 @@ class Crawler(object):
         pid = os.getpid()
         os.kill(pid, signal.SIGTERM)
 
+    def spawn(self, kind):
+        """ Starts one more [kind] worker: 'producer', 'downloader' or 'consumer' """
+        worker = getattr(self, kind)
+        name = str(self.spawned[kind])
+        self.spawned[kind] += 1
+
+        task = self.loop.create_task(worker(name, self))
+        self.tasks.append(task)
+        getattr(self, f'{kind}_tasks').append(task)
+        task.add_done_callback(lambda done: self.forget(kind, done))
+        setattr(self, f'n_{kind}s', self.workers_of(kind))
+        return task
+
+    def retire(self, kind):
+        """ Stops one [kind] worker: right away if it is waiting for work, else once its item is done """
+        tasks = [task for task in getattr(self, f'{kind}_tasks') if task not in self.retiring]
+        if not tasks:
+            return None
+        idle = [task for task in tasks if task in self.idle]
+        task = (idle or tasks)[-1]
+        self.retiring.add(task)
+        if task in self.idle:
+            task.cancel()
+        setattr(self, f'n_{kind}s', self.workers_of(kind))
+        return task
+
+    def forget(self, kind, task):
+        for tasks in (self.tasks, getattr(self, f'{kind}_tasks')):
+            if task in tasks:
+                tasks.remove(task)
+        self.retiring.discard(task)
+        self.idle.discard(task)
+
+    def workers_of(self, kind):
+        return sum(1 for task in getattr(self, f'{kind}_tasks') if task not in self.retiring)
+
+    def idle_workers(self, kind):
+        return sum(1 for task in getattr(self, f'{kind}_tasks') if task in self.idle and task not in self.retiring)
+
+    def working(self):
+        """ The loop condition of a worker: False once the crawl quits or the worker was retired """
+        return not self.quit and asyncio.current_task() not in self.retiring
+
+    async def next_item(self, queue):
+        """ [queue.get] for a worker; while waiting in here the worker is idle and can be cancelled safely """
+        task = asyncio.current_task()
+        self.idle.add(task)
+        try:
+            return await queue.get()
+        finally:
+            self.idle.discard(task)
+
+    def record_fetch(self, seconds, failed=False):
+        self.fetches += 1
+        if failed:
+            self.errors += 1
+        self.latency += Crawler.LATENCY_WEIGHT * (seconds - self.latency)
+
+    async def get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    async def close(self):
+        """ Closes what the crawl wrote to; an error closing one of them is logged and the rest still close """
+        if self.parsers is not None:
+            self.parsers.shutdown()
+        closers = [sink.close for sink in self.sinks] + [self.backlog.close]
+        if self.metadata is not None:
+            closers.append(self.metadata.close)
+        for close in closers:
+            try:
+                closing = close()
+                if inspect.isawaitable(closing):
+                    await closing
+            except Exception as error:
+                logging.error(f'Crawler/close: {close.__self__}: {error!r}')
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def fetch(self, identity: Identified):
+        headers = {'User-Agent': self.user_agent}
+        previous = None
+        if self.recrawl and self.metadata is not None:
+            previous = await self.metadata.get(identity.url)
+            headers.update(self.metadata.headers_for(previous))
+
+        if issubclass(self.downloaded, AsyncDownloaded):
+            session = await self.get_session()
+            download = await self.downloaded(identity,
+                                             chunk_size=self.chunk_size,
+                                             session=session,
+                                             extract=self.extractor == 'stream',
+                                             headers=headers)
+        else:
+            download = self.downloaded(identity, chunk_size=self.chunk_size, headers=headers)
+        # what the metadata had for it before this fetch, for [unchanged]
+        download.previous = previous
+        return download
+
+    def unchanged(self, download: Downloaded):
+        """ True if a recrawl finds [download] as it was last time: a 304, or the same body """
+        if not self.recrawl or self.metadata is None:
+            return False
+        if download.response.status_code == 304:
+            return True
+        previous = getattr(download, 'previous', None)
+        digest = previous[2] if previous is not None else None
+        return digest is not None and digest == download.content_digest()
+
+    def remember(self, download: Downloaded, links=None):
+        if self.metadata is None:
+            return
+        if links is None:
+            self.metadata.record(download)
+        else:
+            self.metadata.record_links(download.identity.url, links)
+
     def say(self, *args, **kwargs):
         line = " ".join(args)
         logging.info(line, **kwargs)
 
-    def gather_links(self, downloaded: Downloaded, parsed: Parsed):
-        if downloaded.identity.is_parsable:
+    def gather_links(self, downloaded: Downloaded):
+        if not downloaded.identity.is_parsable:
+            return
+
+        links = getattr(downloaded, 'links', None)
+        if links is not None:
+            for url in links:
+                yield url
+        elif self.extractor == 'regex':
+            for url in regex_links(downloaded.response.text):
+                yield url
+        else:
+            from .parser import Parsed
+            parsed = Parsed(downloaded.response, parser="lxml")
             for url in parsed.urls_images:
                 yield url
 
@@ -135,18 +330,17 @@ class Crawler(object):
                 yield url
 
     def clean_url(self, link, downloaded):
-        if not link:
-            return ''
-        link = link.strip()
-        link = urllib.parse.urljoin(downloaded.identity.url, link)
+        links = self.clean_urls([link], downloaded)
+        return links[0] if links else ''
+
+    def clean_urls(self, links, downloaded):
+        """ Canonical and unique http(s) links of a page, in one batch """
+        links = self.canonicalizer(links, downloaded.identity.url)
 
         if self.link_cleaners:
             for cleaner in self.link_cleaners:
-                link = cleaner(link)
-
-        if not link.startswith('http://') and not link.startswith('https://'):
-            link = 'http://' + link
-        return link
+                links = [cleaner(link) for link in links]
+        return links
 
     def valid_link(self, link, in_url=''):
         if not link:
@@ -160,36 +354,141 @@ class Crawler(object):
         self.say(f'Crawler/handle_parsing: begin')
         self.say(f'Crawler/handle_parsing: Parsing {downloaded.identity.url}')
         urls = []
-        parsed = Parsed(downloaded.response, parser="lxml")
 
         def yield_all():
-            for url in self.gather_links(downloaded, parsed):
+            for url in self.gather_links(downloaded):
                 yield url
 
             for parsing_handler in self.parsing_handlers:
                 for url in parsing_handler(downloaded, *args, **kwargs):
                     yield url
 
-        for link in yield_all():
-            link = self.clean_url(link, downloaded)
+        links = kwargs.pop('links', None)
+        if links is None:
+            links = self.clean_urls(yield_all(), downloaded)
+        else:
+            # already canonical, out of the parser pool
+            if self.link_cleaners:
+                for cleaner in self.link_cleaners:
+                    links = [cleaner(link) for link in links]
+            if self.parsing_handlers:
+                links = links + self.clean_urls(yield_all(), downloaded)
+
+        for link in links:
             if self.valid_link(link):
                 urls.append(link)
                 # yield link
-        self.say(f'Crawler/handle_parsing: end')
+        self.say(f'Crawler/handle_parsing: end: {self.canonicalizer}')
         return urls
 
-    def handle_download(self, downloaded):
+    async def handle_parsing_batch(self, downloads):
+        """ The links of every download. Those extracted while downloading are taken as they are;
+        the other pages are parsed in the [parsers] pool when there is one """
+        if self.parsers is None:
+            return [self.handle_parsing(download) for download in downloads]
+
+        parsable = [download for download in downloads
+                    if download.identity.is_parsable and getattr(download, 'links', None) is None]
+        if not parsable:
+            return [self.handle_parsing(download) for download in downloads]
+        link_batches = dict(zip(parsable, await self.parsers.parse(parsable)))
+        return [self.handle_parsing(download, links=link_batches[download]) if download in link_batches
+                else self.handle_parsing(download) for download in downloads]
+
+    async def handle_download(self, downloaded):
+        """ Handlers may return an awaitable, e.g. one that waits for room in a store's write queue """
         for handler in self.download_handlers:
-            if not handler(downloaded, self):
+            handled = handler(downloaded, self)
+            if inspect.isawaitable(handled):
+                handled = await handled
+            if not handled:
                 return False
         return True
 
-    def accept(self, url: str, linked_by: str):
-        for acceptor in self.acceptors:
-            if not acceptor(url, linked_by, self):
+    async def admission_open(self):
+        """ Waits while the queues after link admission are over their high watermarks.
+
+        The crawl is a cycle: once the parse queue is full the downloaders
+        wait on the consumers, and the frontier can't drain. Waiting stops
+        then, or after [admission_timeout], and False is returned. """
+        for watermarks in (self.queue_urls.watermarks, self.queue_down.watermarks):
+            if watermarks.is_open:
+                continue
+            self.throttled += 1
+            if not await watermarks.wait(self.admission_timeout, unless=self.queue.watermarks):
                 return False
         return True
 
+    async def admit(self, records, wait=True):
+        """ Puts (link, linked_by) records up for crawling, or in the [backlog] if they can't be admitted now.
+        Without [wait] a closed gate sends them to the backlog right away """
+        if self.router is not None:
+            records = self.router(records, self)
+        if not records:
+            return
+        if wait:
+            admitted = await self.admission_open()
+        else:
+            admitted = self.queue_urls.watermarks.is_open and self.queue_down.watermarks.is_open
+        if admitted:
+            for record in records:
+                await self.queue_urls.put(record)
+        else:
+            self.overflowed += len(records)
+            self.backlog.put_many(records)
+
+    async def accept(self, url: str, linked_by: str):
+        """ Acceptors may return an awaitable, e.g. one that has to fetch a robots.txt first """
+        accepted = self.accept_now(url, linked_by)
+        if inspect.isawaitable(accepted):
+            accepted = await accepted
+        return accepted
+
+    def accept_now(self, url: str, linked_by: str):
+        """ [accept] without waiting: a bool, or an awaitable of one as soon as an acceptor has to wait """
+        for i, acceptor in enumerate(self.acceptors):
+            accepted = acceptor(url, linked_by, self)
+            if inspect.isawaitable(accepted):
+                return self.accept_rest(accepted, i + 1, url, linked_by)
+            if not accepted:
+                return False
+        return True
+
+    async def accept_rest(self, accepted, start, url: str, linked_by: str):
+        if not await accepted:
+            return False
+        for acceptor in self.acceptors[start:]:
+            accepted = acceptor(url, linked_by, self)
+            if inspect.isawaitable(accepted):
+                accepted = await accepted
+            if not accepted:
+                return False
+        return True
+
+    def hold(self, item, accepted):
+        """ Puts [item] up for download once the awaitable [accepted] comes true, in a task of its own:
+        a url waiting for its host's robots.txt doesn't hold up the urls of the other hosts """
+        task = self.loop.create_task(self.release_held(item, accepted))
+        self.held.add(task)
+        self.tasks.append(task)
+        task.add_done_callback(self.forget_held)
+        return task
+
+    async def release_held(self, item, accepted):
+        identity, linked_by = item
+        try:
+            accepted = await accepted
+        except Exception as error:
+            self.say(f'Crawler/hold: [url = {identity.url}] not accepted: {error!r}')
+            return
+        if accepted:
+            self.queue_down.put_nowait(item)
+
+    def forget_held(self, task):
+        self.held.discard(task)
+        if task in self.tasks:
+            self.tasks.remove(task)
+
     def visit(self, url: str, linked_by: str):
         for visitor in self.visitors:
             if not visitor(url, linked_by, self):
@@ -205,9 +504,13 @@ class Crawler(object):
         return f'Crawler:' \
                f' [inputs = {self.inputs}]' \
                f' [output_path = {self.output_path}]' \
-               f' [sleep_time = {self.sleep_time}]' \
+               f' [queue_size = {self.queue_size}]' \
+               f' [frontier_high = {self.frontier_high}]' \
+               f' [backlog = {len(self.backlog)}]' \
                f' [n_producers = {self.n_producers}]' \
-               f' [n_consumers = {self.n_consumers}]'
+               f' [n_consumers = {self.n_consumers}]' \
+               f' [host_rate = {self.host_rate}]' \
+               f' [host_concurrency = {self.host_concurrency}]'
 
 
 async def input_loop(crawler: Crawler):
@@ -260,6 +563,7 @@ async def shutdown(the_signal: signal, crawler: Crawler):
 
     crawler.say(f"shutdown: cancelling {len(tasks)} outstanding tasks")
     await asyncio.gather(*tasks, return_exceptions=True)
+    await crawler.close()
     crawler.say(f"shutdown: flushing metrics")
     crawler.loop.stop()
     crawler.say(f"shutdown: exit")
@@ -268,9 +572,9 @@ async def shutdown(the_signal: signal, crawler: Crawler):
 async def producer(name, crawler: Crawler):
     crawler.say(f"producer: [name = {name}]: start")
 
-    while not crawler.quit:
+    while crawler.working():
         crawler.say(f"producer: [name = {name}]: getting new url data")
-        url, linked_by = await crawler.queue_urls.get()
+        url, linked_by = await crawler.next_item(crawler.queue_urls)
         crawler.queue_urls.task_done()
         crawler.say(f"producer: [name = {name}]: getting new url data: done! [url = {url}] [linked_by = {linked_by}]")
 
@@ -278,11 +582,15 @@ async def producer(name, crawler: Crawler):
         crawler.say(f"producer: [name = {name}] [identity: {identity}]")
 
         crawler.say(f"producer: [name = {name}]: accepting [url = {url}] [linked_by = {linked_by}]")
-        if crawler.accept(url, linked_by):
+        accepted = crawler.accept_now(url, linked_by)
+        if inspect.isawaitable(accepted):
+            crawler.say(f'producer: [name = {name}]: accept = held')
+            crawler.hold((identity, linked_by), accepted)
+        elif accepted:
             crawler.say(f'producer: [name = {name}]: accept = True')
             crawler.say(f"producer: [name = {name}]: Putting {identity.url} for download")
-            await crawler.queue_down.put((identity, linked_by))
-            await asyncio.sleep(crawler.sleep_time)
+            # never waits: queue_urls has to keep draining or the crawl cycle stalls
+            crawler.queue_down.put_nowait((identity, linked_by))
             crawler.say(f"producer: [name = {name}]: Putting {identity.url} for download: done!")
         else:
             crawler.say(f'producer: [name = {name}]: accept = False!')
@@ -291,17 +599,38 @@ async def producer(name, crawler: Crawler):
 
 async def downloader(name, crawler: Crawler):
     crawler.say(f'downloader: [name = {name}]: start')
-    while not crawler.quit:
+    while crawler.working():
         crawler.say(f'downloader: [name = {name}]: Getting data')
-        identity, linked_by = await crawler.queue_down.get()
+        identity, linked_by = await crawler.next_item(crawler.queue_down)
         crawler.queue_down.task_done()
         crawler.say(f'downloader: [name = {name}]: Getting data: done! [identity = {identity}] [linked_by = {linked_by}]')
-        await asyncio.sleep(crawler.sleep_time)
 
         crawler.say(f'downloader: [name = {name}]: handle_download')
         begin = datetime.datetime.now()
-        download: Downloaded = Downloaded(identity, chunk_size=crawler.chunk_size)
-        crawler.handle_download(download)
+        try:
+            download: Downloaded = await crawler.fetch(identity)
+        finally:
+            crawler.queue_down.release(identity)
+        crawler.record_fetch((datetime.datetime.now() - begin).total_seconds(), failed=download.response is None)
+
+        if download.response is None:
+            crawler.say(f'downloader: [name = {name}]: {download} -> Skipping')
+            continue
+
+        if crawler.unchanged(download):
+            links = await crawler.metadata.links_of(identity.url)
+            # a page parsed last time re-admits its links; one never parsed is parsed now
+            if links is not None or not identity.is_parsable or download.response.status_code == 304:
+                crawler.say(f'downloader: [name = {name}]: {download} -> Unchanged')
+                crawler.revalidated += 1
+                crawler.remember(download)
+                # the downloaders drain the frontier: never wait on it here
+                await crawler.admit([(link, identity.url) for link in links or []], wait=False)
+                crawler.visit(identity.url, linked_by)
+                continue
+
+        crawler.remember(download)
+        await crawler.handle_download(download)
 
         end = datetime.datetime.now()
         time_delta = end - begin
@@ -320,14 +649,31 @@ async def downloader(name, crawler: Crawler):
 
 async def consumer(name, crawler: Crawler):
     crawler.say(f"consumer: [name = {name}]: start")
-    while not crawler.quit:
-        download, linked_by = await crawler.queue.get()
-        crawler.queue.task_done()
-        await asyncio.sleep(crawler.sleep_time)
+    while crawler.working():
+        batch = [await crawler.next_item(crawler.queue)]
+        while len(batch) < crawler.parse_batch_size and not crawler.queue.empty():
+            batch.append(crawler.queue.get_nowait())
+        for _ in batch:
+            crawler.queue.task_done()
+
+        downloads = [download for download, _ in batch]
+        link_batches = await crawler.handle_parsing_batch(downloads)
+
+        for (download, linked_by), new_links in zip(batch, link_batches):
+            crawler.remember(download, new_links)
+            await crawler.admit([(new_link, download.identity.url) for new_link in new_links])
+            crawler.visit(download.identity.url, linked_by)
+    crawler.say(f'consumer: [name = {name}]: exit')
 
-        new_links = crawler.handle_parsing(download)
-        for new_link in new_links:
-            await crawler.queue_urls.put((new_link, download.identity.url))
 
-        crawler.visit(download.identity.url, linked_by)
-    crawler.say(f'consumer: [name = {name}]: exit')
+async def refill(crawler: Crawler):
+    """ Feeds the backlog back to [queue_urls] whenever the frontier is under its low watermark """
+    crawler.say(f'refill: start')
+    while not crawler.quit:
+        await crawler.backlog.available.wait()
+        await crawler.queue_down.watermarks.wait()
+        records = crawler.backlog.get_many(crawler.refill_size)
+        crawler.say(f'refill: {len(records)} urls from {crawler.backlog}')
+        for record in records:
+            await crawler.queue_urls.put(record)
+    crawler.say(f'refill: exit')
@@ -15,6 +15,7 @@ import urllib.parse
 from crawly.identifier import Identified
 from crawly.downloader import Downloaded
 from crawly.parser import Parsed
+from crawly.sinks import SinkWriter, TextSink
 
 
 class Crawler(object):
@@ -171,6 +172,7 @@ async def shutdown(s: signal, loop, tasks, crawler: Crawler):
 
     print(f"shutdown: cancelling {len(tasks)} outstanding tasks")
     await asyncio.gather(*tasks, return_exceptions=True)
+    await visits.close()
 
     loop.stop()
     print('shutdown: end')
@@ -198,17 +200,12 @@ async def initial(queue, crawler: Crawler):
 
 
 visited_path = '/home/borko/devel/crawly/visited.urls'
+visits = SinkWriter(TextSink(visited_path))
 
 
 def register_url(url: str, linked_by: str, context: Crawler):
-    global visited_path
     print(f'register_url: [url: {url}] [linked_by: {linked_by}]')
-
-    with open(visited_path, "a") as f:
-        f.write(f"{url}")
-        if linked_by:
-            f.write(f"\t{linked_by}")
-        f.write(f"\n")
+    visits.put((url, linked_by))
     return True
 
 
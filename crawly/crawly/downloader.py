@@ -1,14 +1,23 @@
-import requests
+import asyncio
+import hashlib
+import aiohttp
 from crawly.identifier import Identified
+from crawly.extractor import LinkExtractor
 import os
 
 
+def body_hasher():
+    return hashlib.blake2b(digest_size=Downloaded.DIGEST_SIZE)
+
+
 class Downloaded(object):
     DEFAULT_CHUNK_SIZE = 1024 * 64
+    DIGEST_SIZE = 16
 
     def __init__(self, url_identity, **kwargs):
         self.identity: Identified = url_identity
         self.response = None
+        self.digest = None
         self.chunk_size = kwargs.pop('chunk_size', Downloaded.DEFAULT_CHUNK_SIZE)
         self.init(url_identity, **kwargs)
 
@@ -20,8 +29,10 @@ class Downloaded(object):
         if isinstance(url_identity, str):
             self.identity = Identified(url_identity)
 
+        import requests
         kwargs['allow_redirects'] = True
         self.response = requests.get(self.url, **kwargs)
+        self.identity.resolve(self.response.headers, self.response.content[0:512])
         return self.response
 
     def __str__(self):
@@ -32,6 +43,15 @@ class Downloaded(object):
 
         return f"Downloaded: [url={self.url}] {status_code}"
 
+    def content_digest(self):
+        """ The hex blake2b digest of the body; streamed downloads have it already """
+        if self.digest is None and self.response is not None:
+            hasher = body_hasher()
+            for chunk in self.response.iter_content(chunk_size=self.chunk_size):
+                hasher.update(chunk)
+            self.digest = hasher.hexdigest()
+        return self.digest
+
     def save_chunks(self, host_path):
         with open(host_path, 'wb') as fd:
             for chunk in self.response.iter_content(chunk_size=self.chunk_size):
@@ -69,3 +89,97 @@ class Downloaded(object):
             file_path = os.path.join(dir_path, self.identity.basename)
 
         return dir_path, file_path
+
+
+class Response(object):
+    """ The parts of [requests.Response] that the crawler uses, filled from an aiohttp response """
+
+    def __init__(self, url, status_code, headers, chunks, encoding=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.chunks = chunks
+        self.encoding = encoding
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def content(self):
+        return b''.join(self.chunks)
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def iter_content(self, chunk_size=1):
+        for chunk in self.chunks:
+            yield chunk
+
+
+class AsyncDownloaded(Downloaded):
+    """ Downloaded that streams its body through an aiohttp session.
+
+    Construction does not touch the network; await the object to fetch it:
+
+        download = await AsyncDownloaded(identity, session=session)
+    """
+
+    def __init__(self, url_identity, **kwargs):
+        self.session: aiohttp.ClientSession = kwargs.pop('session', None)
+        self.extract = kwargs.pop('extract', False)
+        self.links = None
+        self.request_kwargs = {}
+        self.error = None
+        super().__init__(url_identity, **kwargs)
+
+    def init(self, url_identity, **kwargs):
+        if isinstance(url_identity, str):
+            self.identity = Identified(url_identity)
+
+        kwargs['allow_redirects'] = True
+        self.request_kwargs = kwargs
+        return self
+
+    async def fetch(self, session: aiohttp.ClientSession = None):
+        session = session or self.session
+        chunks = []
+        extractor = None
+        hasher = body_hasher()
+        try:
+            async with session.get(self.url, **self.request_kwargs) as response:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    if not chunks:
+                        self.identity.resolve(response.headers, chunk)
+                        if self.extract and self.identity.is_parsable:
+                            extractor = LinkExtractor(response.charset)
+                            self.links = []
+                    chunks.append(chunk)
+                    hasher.update(chunk)
+                    if extractor:
+                        self.links.extend(extractor.feed(chunk))
+
+                if not chunks:
+                    self.identity.resolve(response.headers)
+                if extractor:
+                    self.links.extend(extractor.close())
+                self.digest = hasher.hexdigest()
+
+                self.response = Response(str(response.url),
+                                         response.status,
+                                         response.headers,
+                                         chunks,
+                                         response.charset)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            self.error = error
+            self.response = None
+        return self
+
+    def __await__(self):
+        return self.fetch().__await__()
+
+    def __str__(self):
+        if self.error:
+            return f"Downloaded: [url={self.url}] [error = {self.error}]"
+        return super().__str__()
@@ -0,0 +1,99 @@
+import re
+
+from lxml import etree
+
+
+HREF_RE = re.compile(r'href="(.*?)"')
+SRC_RE = re.compile(r'src="(.*?)"')
+DATA_IMAGEURL_RE = re.compile(r'data-imageurl="(.*?)"')
+DATA_SRC_RE = re.compile(r'data-src="(.*?)"')
+
+EXTRACTORS = ('stream', 'soup', 'regex')
+
+
+def tag_links(tag, attributes):
+    """ The links of an <a> or <img> tag, the way [Parsed] finds them """
+    if tag == 'a':
+        value = attributes.get('href')
+        if value:
+            yield value
+        value = attributes.get('data-imageurl')
+        if value:
+            yield value
+    else:
+        value = attributes.get('src')
+        if value:
+            yield value
+        data_src = attributes.get('data-src')
+        if data_src:
+            for src in data_src.split("|"):
+                if src:
+                    yield src
+
+
+class LinkExtractor(object):
+    """ Pulls links out of html while it is still arriving.
+
+    Feed it body chunks; every [feed] returns the links of the tags
+    completed so far. Only <a> and <img> start tags are reported by the
+    underlying lxml pull parser. """
+
+    TAGS = ('a', 'img')
+
+    def __init__(self, encoding=None):
+        self.parser = etree.HTMLPullParser(events=('start',), tag=self.TAGS, encoding=encoding)
+        self.count = 0
+
+    def links(self):
+        links = []
+        for _, element in self.parser.read_events():
+            tag = element.tag.lower() if isinstance(element.tag, str) else ''
+            if tag in self.TAGS:
+                links.extend(tag_links(tag, element.attrib))
+        self.count += len(links)
+        return links
+
+    def feed(self, chunk: bytes):
+        self.parser.feed(chunk)
+        return self.links()
+
+    def close(self):
+        try:
+            self.parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        return self.links()
+
+    def __str__(self):
+        return f'LinkExtractor: [links = {self.count}]'
+
+
+def stream_links(chunks, encoding=None):
+    extractor = LinkExtractor(encoding)
+    for chunk in chunks:
+        for link in extractor.feed(chunk):
+            yield link
+    for link in extractor.close():
+        yield link
+
+
+def soup_links(text, parser="lxml"):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(text, features=parser)
+    for tag in soup.find_all('img'):
+        yield from tag_links('img', tag.attrs)
+    for tag in soup.find_all('a'):
+        yield from tag_links('a', tag.attrs)
+
+
+def regex_links(text):
+    """ The [base2.gather_links] way: regular expressions over the raw text """
+    for link in HREF_RE.findall(text):
+        yield link
+    for link in SRC_RE.findall(text):
+        yield link
+    for link in DATA_IMAGEURL_RE.findall(text):
+        yield link
+    for link in DATA_SRC_RE.findall(text):
+        for data_src_link in link.split("|"):
+            yield data_src_link
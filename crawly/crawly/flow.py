@@ -0,0 +1,137 @@
+import asyncio
+import os
+import tempfile
+
+
+class Watermarks(object):
+    """ A gate that closes once [high] items are waiting and opens again at [low] """
+
+    def __init__(self, high=0, low=None):
+        self.high = high
+        self.low = low if low is not None else high // 2
+        self.open = asyncio.Event()
+        self.open.set()
+        self.closed = asyncio.Event()
+
+    def update(self, size):
+        if not self.high:
+            return
+        if size >= self.high:
+            self.open.clear()
+            self.closed.set()
+        elif size <= self.low:
+            self.open.set()
+            self.closed.clear()
+
+    @property
+    def is_open(self):
+        return self.open.is_set()
+
+    async def wait(self, timeout=None, unless=None):
+        """ Waits for the gate to open. Returns False if [timeout] ran out first,
+        or if the [unless] watermarks closed in the meantime """
+        if self.open.is_set():
+            return True
+        if unless is not None and not unless.is_open:
+            return False
+
+        waits = [asyncio.ensure_future(self.open.wait())]
+        if unless is not None:
+            waits.append(asyncio.ensure_future(unless.closed.wait()))
+        try:
+            await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiting in waits:
+                waiting.cancel()
+        return self.open.is_set()
+
+    def __str__(self):
+        return f'Watermarks: [high = {self.high}] [low = {self.low}] [open = {self.is_open}]'
+
+
+class WatermarkQueue(asyncio.Queue):
+    """ asyncio.Queue with [watermarks] that follow its size.
+
+    [maxsize] still makes [put] wait; the watermarks are for callers
+    upstream that should slow down before that. """
+
+    def __init__(self, maxsize=0, high=None, low=None):
+        super().__init__(maxsize)
+        if high is None:
+            high = maxsize * 3 // 4
+        self.watermarks = Watermarks(high, low)
+
+    def _put(self, item):
+        super()._put(item)
+        self.watermarks.update(self.qsize())
+
+    def _get(self):
+        item = super()._get()
+        self.watermarks.update(self.qsize())
+        return item
+
+
+class Backlog(object):
+    """ (url, linked_by) records that could not be admitted yet.
+
+    They are spilled to [path] (a temporary file by default) instead of
+    memory, and read back in order with [get_many]. """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.file = None
+        self.read_at = 0
+        self.size = 0
+        self.spilled = 0
+        self.available = asyncio.Event()
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.path, 'w+b') if self.path else tempfile.TemporaryFile()
+        return self.file
+
+    def put_many(self, records):
+        if not records:
+            return
+        file = self.open()
+        file.seek(0, os.SEEK_END)
+        file.write(''.join(f'{url}\t{linked_by}\n' for url, linked_by in records).encode())
+        self.size += len(records)
+        self.spilled += len(records)
+        self.available.set()
+
+    def get_many(self, max_n):
+        if not self.size:
+            return []
+        self.file.seek(self.read_at)
+        records = []
+        while len(records) < max_n:
+            line = self.file.readline()
+            if not line:
+                break
+            url, _, linked_by = line.decode().rstrip('\n').partition('\t')
+            records.append((url, linked_by))
+        self.read_at = self.file.tell()
+        self.size -= len(records)
+
+        if not self.size:
+            # all read back; start over instead of growing the file
+            self.file.seek(0)
+            self.file.truncate()
+            self.read_at = 0
+            self.available.clear()
+        return records
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.size = 0
+        self.read_at = 0
+        self.available.clear()
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return f'Backlog: [path = {self.path}] [size = {self.size}] [spilled = {self.spilled}]'
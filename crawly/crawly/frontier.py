@@ -0,0 +1,202 @@
+import asyncio
+import collections
+import heapq
+
+from crawly.identifier import Identified
+from crawly.flow import Watermarks
+
+
+class TokenBucket(object):
+    """ [rate] fetches per second with bursts of up to [burst] fetches """
+
+    def __init__(self, rate, burst=1.0, now=0.0):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def refill(self, now):
+        if now > self.stamp:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def ready_at(self, now):
+        """ The time at which a token is available """
+        self.refill(now)
+        if self.tokens >= 1.0 or not self.rate:
+            return now
+        return now + (1.0 - self.tokens) / self.rate
+
+    def take(self, now):
+        self.refill(now)
+        self.tokens -= 1.0
+
+    def full(self, now):
+        """ True once the bucket has refilled to [burst], as a new one starts """
+        return not self.rate or self.tokens + (now - self.stamp) * self.rate >= self.burst
+
+
+class HostQueue(object):
+    def __init__(self, host, rate, burst, now):
+        self.host = host
+        self.items = collections.deque()
+        self.bucket = TokenBucket(rate, burst, now)
+        self.active = 0
+        self.scheduled = False
+
+    def __len__(self):
+        return len(self.items)
+
+    def __str__(self):
+        return f'HostQueue: [host = {self.host}] [items = {len(self)}] [active = {self.active}]'
+
+
+class Frontier(object):
+    """ Per-host queues of (identity, linked_by) items.
+
+    A host can be fetched from when its token bucket has a token and it
+    has less than [host_concurrency] fetches in flight. [get] only ever
+    returns an item of such a host, so a throttled host never holds up
+    the others. Call [release] once the fetch of an item is over.
+
+    The frontier itself never refuses an item; its [watermarks] close
+    once [high] items are waiting so link admission can slow down.
+
+    Every [sweep_interval] seconds the hosts with nothing waiting or in
+    flight whose bucket has refilled are dropped: a new queue for them
+    would start the same. A rate set for a host, e.g. by a Crawl-delay,
+    is kept apart and outlives its queue. """
+
+    HOST_RATE = 1.0
+    HOST_BURST = 1.0
+    HOST_CONCURRENCY = 2
+    SWEEP_INTERVAL = 10.0
+
+    def __init__(self, **kwargs):
+        self.host_rate = kwargs.pop('host_rate', Frontier.HOST_RATE)
+        self.host_burst = kwargs.pop('host_burst', Frontier.HOST_BURST)
+        self.host_concurrency = kwargs.pop('host_concurrency', Frontier.HOST_CONCURRENCY)
+        self.watermarks = Watermarks(kwargs.pop('high', 0), kwargs.pop('low', None))
+        self.sweep_interval = kwargs.pop('sweep_interval', Frontier.SWEEP_INTERVAL)
+
+        self.hosts = {}
+        self.rates = {}     # host -> (rate, burst) set apart from the defaults
+        self.swept_at = None
+        self.evicted = 0
+        self.ready = []     # heap of (next allowed fetch time, host)
+        self.size = 0
+        self.changed = asyncio.Event()
+
+    @staticmethod
+    def now():
+        return asyncio.get_running_loop().time()
+
+    def host_queue(self, host):
+        host_queue = self.hosts.get(host)
+        if host_queue is None:
+            rate, burst = self.rates.get(host, (self.host_rate, self.host_burst))
+            host_queue = HostQueue(host, rate, burst, self.now())
+            self.hosts[host] = host_queue
+        return host_queue
+
+    def sweep(self, now):
+        """ Drops the hosts that are idle with a full bucket """
+        self.swept_at = now
+        idle = [host for host, host_queue in self.hosts.items()
+                if not host_queue.items and not host_queue.active and not host_queue.scheduled
+                and host_queue.bucket.full(now)]
+        for host in idle:
+            del self.hosts[host]
+        self.evicted += len(idle)
+
+    def schedule(self, host_queue: HostQueue):
+        if host_queue.scheduled or not host_queue.items:
+            return
+        if host_queue.active >= self.host_concurrency:
+            return
+        host_queue.scheduled = True
+        heapq.heappush(self.ready, (host_queue.bucket.ready_at(self.now()), host_queue.host))
+        self.changed.set()
+
+    def set_rate(self, host, rate, burst=None):
+        host_queue = self.host_queue(host)
+        host_queue.bucket.rate = rate
+        if burst is not None:
+            host_queue.bucket.burst = burst
+        self.rates[host] = (host_queue.bucket.rate, host_queue.bucket.burst)
+
+    def set_delay(self, host, delay):
+        """ Honours a crawl delay of [delay] seconds between fetches of [host].
+        A delay only ever slows a host down; a rate of 0 is unlimited """
+        if delay and delay > 0:
+            rate = self.host_queue(host).bucket.rate
+            if not rate or 1.0 / delay < rate:
+                self.set_rate(host, 1.0 / delay, 1.0)
+
+    def put_nowait(self, item):
+        identity, linked_by = item
+        host_queue = self.host_queue(identity.server)
+        host_queue.items.append(item)
+        self.size += 1
+        self.watermarks.update(self.size)
+        self.schedule(host_queue)
+
+    async def put(self, item):
+        self.put_nowait(item)
+
+    async def get(self):
+        while True:
+            now = self.now()
+            if self.swept_at is None or now - self.swept_at >= self.sweep_interval:
+                self.sweep(now)
+            while self.ready and self.ready[0][0] <= now:
+                _, host = heapq.heappop(self.ready)
+                host_queue = self.hosts[host]
+                host_queue.scheduled = False
+
+                if not host_queue.items or host_queue.active >= self.host_concurrency:
+                    continue
+
+                ready_at = host_queue.bucket.ready_at(now)
+                if ready_at > now:
+                    host_queue.scheduled = True
+                    heapq.heappush(self.ready, (ready_at, host))
+                    continue
+
+                host_queue.bucket.take(now)
+                host_queue.active += 1
+                self.size -= 1
+                self.watermarks.update(self.size)
+                item = host_queue.items.popleft()
+                self.schedule(host_queue)
+                return item
+
+            timeout = self.ready[0][0] - now if self.ready else None
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def task_done(self):
+        pass
+
+    def release(self, identity: Identified):
+        host_queue = self.hosts.get(identity.server)
+        if host_queue is None:
+            return
+        host_queue.active -= 1
+        self.schedule(host_queue)
+
+    def qsize(self):
+        return self.size
+
+    def empty(self):
+        return self.size == 0
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return f'Frontier: [hosts = {len(self.hosts)}] [items = {self.size}] [ready = {len(self.ready)}]' \
+               f' [evicted = {self.evicted}]'
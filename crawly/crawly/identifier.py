@@ -1,26 +1,127 @@
-import requests
+import collections
+import mimetypes
 from urllib.parse import urlparse
 import os
 
 
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'\x00\x00\x01\x00', 'image/x-icon'),
+]
+
+HTML_SIGNATURES = [b'<!doctype html', b'<html', b'<head', b'<body', b'<!--']
+
+
+def sniff(first_bytes: bytes):
+    """ Guesses a content type out of the first bytes of a body """
+    if not first_bytes:
+        return None
+
+    for signature, content_type in SIGNATURES:
+        if first_bytes.startswith(signature):
+            return content_type
+
+    if first_bytes[0:4] == b'RIFF' and first_bytes[8:12] == b'WEBP':
+        return 'image/webp'
+
+    head = first_bytes[0:512].lstrip().lower()
+    if head.startswith(b'\xef\xbb\xbf'):
+        head = head[3:]
+    for signature in HTML_SIGNATURES:
+        if head.startswith(signature):
+            return 'text/html'
+    return None
+
+
+class Classifier(object):
+    """ Remembers the content type seen for the last [MAX_SIZE] (host, extension) pairs.
+    Urls without an extension aren't remembered: a host serves pages and images alike under those """
+    MAX_SIZE = 10000
+
+    __attrs = {
+        'the_types': collections.OrderedDict(),
+    }
+
+    def __init__(self):
+        self.__dict__ = Classifier.__attrs
+
+    @staticmethod
+    def key(identity):
+        extension = identity.extension
+        if not extension:
+            return None
+        return identity.server, extension.lower()
+
+    def lookup(self, identity):
+        key = self.key(identity)
+        content_type = self.the_types.get(key) if key is not None else None
+        if content_type is not None:
+            self.the_types.move_to_end(key)
+        return content_type
+
+    def learn(self, identity, content_type):
+        key = self.key(identity)
+        if content_type and key is not None:
+            self.the_types[key] = content_type
+            self.the_types.move_to_end(key)
+            if len(self.the_types) > Classifier.MAX_SIZE:
+                self.the_types.popitem(last=False)
+
+    def clear(self):
+        self.the_types.clear()
+
+
 class Identified(object):
-    def __init__(self, url='127.0.0.1/identify'):
+    def __init__(self, url='127.0.0.1/identify', head=False):
         self.url = url
         self.links = set()
         self.head = None
+        self.use_head = head
         self.parsed_url = None
-        self.head = None
+        self.resolved_headers = None
+        self.resolved_type = None
         self.init(url)
 
     def init(self, url):
         self.url = url
         self.parsed_url = urlparse(self.url)
 
+    def resolve(self, headers, first_bytes=b''):
+        """ Classifies the url out of the headers and first bytes of an actual GET """
+        self.resolved_headers = headers
+        content_type = headers.get('content-type')
+
+        if not content_type or content_type.lower().startswith('application/octet-stream'):
+            content_type = sniff(first_bytes) or content_type
+
+        self.resolved_type = content_type
+        Classifier().learn(self, content_type)
+        return content_type
+
+    def fetch_head(self):
+        """ Issues a HEAD request. Only done when asked for explicitly """
+        import requests
+        self.head = requests.head(self.url, allow_redirects=True)
+        self.resolve(self.head.headers)
+        return self.head
+
+    @property
+    def is_resolved(self):
+        return self.resolved_headers is not None
+
     @property
     def headers(self):
-        if not self.head:
-            self.head = requests.head(self.url, allow_redirects=True)
-        return self.head.headers
+        if not self.is_resolved and self.use_head:
+            self.fetch_head()
+        if not self.is_resolved:
+            return {}
+        return self.resolved_headers
 
     @property
     def server(self):
@@ -69,7 +170,16 @@ class Identified(object):
 
     @property
     def content_type(self):
-        return self.headers.get('content-type')
+        """ The resolved content type, or a guess out of the classification cache and the extension """
+        if not self.is_resolved and self.use_head:
+            self.fetch_head()
+        if self.is_resolved:
+            return self.resolved_type
+
+        content_type = Classifier().lookup(self)
+        if not content_type and self.extension:
+            content_type, _ = mimetypes.guess_type(self.path)
+        return content_type
 
     @property
     def is_downloadable(self):
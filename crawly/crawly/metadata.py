@@ -0,0 +1,172 @@
+import asyncio
+import concurrent.futures
+import logging
+import sqlite3
+import time
+
+from crawly.downloader import Downloaded
+
+
+class MetaStore(object):
+    """ What the last fetch of every url found, kept across runs in SQLite at [path].
+
+    Per url: the ETag and Last-Modified validators, the digest of the
+    body, the fetch time and status, and the links of the page.
+
+    SQLite is only touched from a thread of the store's own, never from
+    the event loop: [get] and [links_of] are awaited, [record] and
+    [record_links] only queue, and a full batch is written in the
+    background. Lookups see the batches that are not written yet. An
+    error writing a batch is logged and raised again by [close]. """
+
+    BATCH_SIZE = 256
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.batch_size = kwargs.pop('batch_size', MetaStore.BATCH_SIZE)
+        self.connection = None
+        self.executor = None
+        self.pending_pages = {}
+        self.pending_links = {}
+        self.writing = []   # (pages, links) of the batches on their way to the database, oldest first
+        self.writes = set()
+        self.error = None
+
+    def open(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS pages'
+                                    ' (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,'
+                                    ' digest TEXT, fetched_at REAL, status INTEGER)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS links (url TEXT PRIMARY KEY, links TEXT)')
+            self.connection.commit()
+        return self.connection
+
+    def run(self, function, *args):
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='metastore')
+        return asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def select_page(self, url):
+        return self.open().execute('SELECT etag, last_modified, digest, fetched_at, status FROM pages WHERE url = ?',
+                                   (url,)).fetchone()
+
+    def select_links(self, url):
+        row = self.open().execute('SELECT links FROM links WHERE url = ?', (url,)).fetchone()
+        return row[0] if row is not None else None
+
+    async def get(self, url):
+        """ (etag, last_modified, digest, fetched_at, status) of [url], or None """
+        page = await self.run(self.select_page, url)
+        for pages, _ in self.writing + [(self.pending_pages, None)]:
+            newer = pages.get(url)
+            if newer is not None:
+                page = newer if page is None else tuple(new if new is not None else old
+                                                        for new, old in zip(newer, page))
+        return page
+
+    @staticmethod
+    def headers_for(page):
+        """ If-None-Match / If-Modified-Since for revalidating a [page] as [get] returns it """
+        headers = {}
+        if page is not None:
+            etag, last_modified = page[0], page[1]
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    async def conditional_headers(self, url):
+        """ If-None-Match / If-Modified-Since for a revalidating fetch of [url] """
+        return self.headers_for(await self.get(url))
+
+    async def digest_of(self, url):
+        page = await self.get(url)
+        return page[2] if page is not None else None
+
+    async def links_of(self, url):
+        """ The links [url] had when it was last parsed, or None if it never was """
+        links = self.pending_links.get(url)
+        for _, written in reversed(self.writing):
+            if links is None:
+                links = written.get(url)
+        if links is None:
+            links = await self.run(self.select_links, url)
+            if links is None:
+                return None
+        return links.split('\n') if links else []
+
+    def record(self, download: Downloaded):
+        """ Remembers the validators and digest of [download]; a 304 keeps the digest it had """
+        response = download.response
+        digest = None if response.status_code == 304 else download.content_digest()
+        self.pending_pages[download.identity.url] = (response.headers.get('ETag'),
+                                                     response.headers.get('Last-Modified'),
+                                                     digest,
+                                                     time.time(),
+                                                     response.status_code)
+        self.flush_full()
+
+    def record_links(self, url, links):
+        self.pending_links[url] = '\n'.join(links)
+        self.flush_full()
+
+    def flush_full(self):
+        if len(self.pending_pages) + len(self.pending_links) >= self.batch_size:
+            self.flush()
+
+    def write_batch(self, pages, links):
+        with self.open():
+            self.connection.executemany('INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?)'
+                                        ' ON CONFLICT(url) DO UPDATE SET'
+                                        ' etag = COALESCE(excluded.etag, etag),'
+                                        ' last_modified = COALESCE(excluded.last_modified, last_modified),'
+                                        ' digest = COALESCE(excluded.digest, digest),'
+                                        ' fetched_at = excluded.fetched_at,'
+                                        ' status = excluded.status',
+                                        [(url,) + page for url, page in pages.items()])
+            self.connection.executemany('INSERT OR REPLACE INTO links VALUES (?, ?)', list(links.items()))
+
+    def flush(self):
+        """ Starts writing the pending batch on the store's thread """
+        if not self.pending_pages and not self.pending_links:
+            return None
+        batch = (self.pending_pages, self.pending_links)
+        self.pending_pages = {}
+        self.pending_links = {}
+        self.writing.append(batch)
+        write = self.run(self.write_batch, *batch)
+        self.writes.add(write)
+        write.add_done_callback(lambda done: self.written(batch, done))
+        return write
+
+    def written(self, batch, write):
+        self.writes.discard(write)
+        self.writing = [other for other in self.writing if other is not batch]
+        if not write.cancelled() and write.exception() is not None:
+            logging.error(f'MetaStore: [path = {self.path}] writing {len(batch[0])} pages failed: {write.exception()!r}')
+            self.error = self.error or write.exception()
+
+    def disconnect(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    async def close(self):
+        """ Writes out whatever is pending and closes the database; raises the first write error, if any """
+        self.flush()
+        if self.writes:
+            await asyncio.gather(*self.writes, return_exceptions=True)
+        await self.run(self.disconnect)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def __str__(self):
+        return f'MetaStore: [path = {self.path}] [pending = {len(self.pending_pages)}] [writing = {len(self.writing)}]'
@@ -0,0 +1,90 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+
+from crawly.canonical import Canonicalizer
+from crawly.extractor import stream_links, soup_links, regex_links
+
+
+worker_canonicalizer = None
+
+
+def init_worker(canonical_settings):
+    global worker_canonicalizer
+    worker_canonicalizer = Canonicalizer(**canonical_settings)
+
+
+def parse_pages(pages, extractor='stream'):
+    """ Runs in a worker process.
+
+    [pages] is a list of (url, body, encoding). Returns the canonical
+    links of every page as one newline-joined string, and the number of
+    links and duplicates the canonicalizer went through. """
+    canonicalizer = worker_canonicalizer or Canonicalizer()
+    count, duplicates = canonicalizer.links, canonicalizer.duplicates
+    results = []
+    for url, body, encoding in pages:
+        if extractor == 'stream':
+            links = stream_links([body], encoding)
+        elif extractor == 'regex':
+            links = regex_links(body.decode(encoding or 'utf-8', errors='replace'))
+        else:
+            links = soup_links(body.decode(encoding or 'utf-8', errors='replace'))
+        results.append('\n'.join(canonicalizer(links, url)))
+    return results, canonicalizer.links - count, canonicalizer.duplicates - duplicates
+
+
+class ParserPool(object):
+    """ Parses batches of downloaded pages in a pool of worker processes.
+
+    At most [n_workers] * [in_flight] batches are submitted at once;
+    callers of [parse] wait for room beyond that. The workers are
+    spawned, not forked, as the crawler has threads running by the
+    time the pool starts. """
+
+    N_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+    BATCH_SIZE = 8
+    IN_FLIGHT = 2
+
+    def __init__(self, **kwargs):
+        self.n_workers = kwargs.pop('n_workers', ParserPool.N_WORKERS)
+        self.batch_size = kwargs.pop('batch_size', ParserPool.BATCH_SIZE)
+        self.extractor = kwargs.pop('extractor', 'stream')
+        self.canonicalizer = kwargs.pop('canonicalizer', Canonicalizer())
+        self.in_flight = asyncio.Semaphore(self.n_workers * kwargs.pop('in_flight', ParserPool.IN_FLIGHT))
+        self.executor = None
+
+    def start(self):
+        if self.executor is None:
+            settings = {
+                'schemes': self.canonicalizer.schemes,
+                'tracking_params': self.canonicalizer.tracking_params,
+                'tracking_prefixes': self.canonicalizer.tracking_prefixes,
+                'sort_query': self.canonicalizer.sort_query,
+            }
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.n_workers,
+                                                                   mp_context=multiprocessing.get_context('spawn'),
+                                                                   initializer=init_worker,
+                                                                   initargs=(settings,))
+        return self.executor
+
+    async def parse(self, downloads):
+        """ The canonical links of every download, parsed off the event loop """
+        pages = [(download.identity.url, download.response.content, download.response.encoding)
+                 for download in downloads]
+        async with self.in_flight:
+            loop = asyncio.get_running_loop()
+            results, count, duplicates = await loop.run_in_executor(self.start(), parse_pages, pages, self.extractor)
+
+        self.canonicalizer.links += count
+        self.canonicalizer.duplicates += duplicates
+        return [joined.split('\n') if joined else [] for joined in results]
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def __str__(self):
+        return f'ParserPool: [n_workers = {self.n_workers}] [batch_size = {self.batch_size}] [extractor = {self.extractor}]'
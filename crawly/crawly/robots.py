@@ -0,0 +1,269 @@
+import asyncio
+import re
+import time
+import urllib.parse
+
+import aiohttp
+
+
+class RobotsRules(object):
+    """ The Allow / Disallow rules of one robots.txt group, compiled into a prefix trie.
+
+    [allowed] walks the path through the trie once, so a lookup is
+    O(path length) whatever the number of rules. The longest matching
+    rule wins and Allow wins a tie, as in RFC 9309. The few rules with
+    '*' or '$' in them can't be prefixes and are matched as regexes. """
+
+    END = ''    # trie key of the rule ending at a node
+
+    def __init__(self, rules=(), crawl_delay=None):
+        self.trie = {}
+        self.patterns = []
+        self.crawl_delay = crawl_delay
+        self.count = 0
+        for allow, path in rules:
+            self.add(allow, path)
+
+    @staticmethod
+    def allow_all():
+        return RobotsRules()
+
+    @staticmethod
+    def disallow_all():
+        return RobotsRules([(False, '/')])
+
+    def add(self, allow, path):
+        if not path:
+            # an empty Disallow disallows nothing
+            return
+        path = normalize_path(path)
+        self.count += 1
+
+        if '*' in path or path.endswith('$'):
+            anchored = path.endswith('$')
+            pattern = re.escape(path.rstrip('$')).replace(r'\*', '.*')
+            self.patterns.append((re.compile(pattern + ('$' if anchored else '')), len(path), allow))
+            return
+
+        node = self.trie
+        for char in path:
+            node = node.setdefault(char, {})
+        current = node.get(self.END)
+        # the same path both allowed and disallowed: allow
+        node[self.END] = allow if current is None else current or allow
+
+    def match(self, path):
+        """ (length, allow) of the longest rule matching [path], or None """
+        best = None
+        node = self.trie
+        if self.END in node:
+            best = (0, node[self.END])
+        for depth, char in enumerate(path, 1):
+            node = node.get(char)
+            if node is None:
+                break
+            if self.END in node:
+                best = (depth, node[self.END])
+
+        for pattern, length, allow in self.patterns:
+            if pattern.match(path) and (best is None or length > best[0] or (length == best[0] and allow)):
+                best = (length, allow)
+        return best
+
+    def allowed(self, path):
+        path = normalize_path(path or '/')
+        if path == '/robots.txt':
+            return True
+        best = self.match(path)
+        return best is None or best[1]
+
+    def __str__(self):
+        return f'RobotsRules: [rules = {self.count}] [patterns = {len(self.patterns)}] [crawl_delay = {self.crawl_delay}]'
+
+
+def normalize_path(path):
+    """ Percent-encodings in one case so that rules and paths compare as bytes would """
+    if '%' in path:
+        return re.sub(r'%[0-9a-fA-F]{2}', lambda m: m.group(0).upper(), path)
+    return path
+
+
+def product_token(user_agent):
+    """ 'crawly' of 'Crawly/1.0 (+https://example.com)', lower case """
+    return user_agent.split('/', 1)[0].split(' ', 1)[0].strip().lower()
+
+
+def parse_robots(text, user_agent='crawly'):
+    """ The rules of the group of [user_agent] in robots.txt [text]; the '*' group if it has none.
+    Groups match on the product token of [user_agent], exactly and in any case """
+    agent = product_token(user_agent)
+    groups = []     # (agents, rules, crawl_delay)
+    agents, rules, delay = [], [], None
+    in_rules = False
+
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        field, value = line.split(':', 1)
+        field, value = field.strip().lower(), value.strip()
+
+        if field == 'user-agent':
+            if in_rules:
+                groups.append((agents, rules, delay))
+                agents, rules, delay = [], [], None
+                in_rules = False
+            agents.append(value.lower())
+        elif field in ('allow', 'disallow'):
+            in_rules = True
+            rules.append((field == 'allow', value))
+        elif field == 'crawl-delay':
+            in_rules = True
+            try:
+                delay = float(value)
+            except ValueError:
+                pass
+    if agents:
+        groups.append((agents, rules, delay))
+
+    chosen, fallback = [], []
+    for agents, rules, delay in groups:
+        if any(name != '*' and product_token(name) == agent for name in agents):
+            chosen.append((rules, delay))
+        elif '*' in agents:
+            fallback.append((rules, delay))
+
+    compiled = RobotsRules()
+    for rules, delay in chosen or fallback:
+        for allow, path in rules:
+            compiled.add(allow, path)
+        if delay is not None:
+            compiled.crawl_delay = delay
+    return compiled
+
+
+class Robots(object):
+    """ A robots.txt acceptor with a per-host cache.
+
+    A host's robots.txt is fetched once per [ttl] seconds, and only once
+    however many urls of the host are waiting for it. A missing one
+    (4xx) allows everything and is cached as long; a server error or a
+    network failure disallows the host for [error_ttl] seconds.
+
+    Once the rules of a host are cached an acceptor call is a plain
+    function call returning a bool; only a miss returns a coroutine,
+    which the crawler awaits apart from its producer (Crawler.hold), so
+    a slow robots.txt holds up the urls of its host only. A
+    Crawl-delay is handed to the crawler's frontier.
+
+    The rules obeyed are those for [user_agent], by default the one the
+    crawler sends, and robots.txt is fetched with it too. """
+
+    USER_AGENT = 'crawly'
+    TTL = 24 * 60 * 60
+    ERROR_TTL = 5 * 60
+    MAX_SIZE = 500 * 1024
+    TIMEOUT = 10.0
+
+    def __init__(self, **kwargs):
+        self.user_agent = kwargs.pop('user_agent', None)
+        self.ttl = kwargs.pop('ttl', Robots.TTL)
+        self.error_ttl = kwargs.pop('error_ttl', Robots.ERROR_TTL)
+        self.max_size = kwargs.pop('max_size', Robots.MAX_SIZE)
+        self.timeout = kwargs.pop('timeout', Robots.TIMEOUT)
+        self.session = kwargs.pop('session', None)
+
+        self.cache = {}     # host -> (expires, RobotsRules)
+        self.pending = {}   # host -> future of RobotsRules
+        self.fetched = 0
+        self.denied = 0
+
+    def cached(self, host):
+        entry = self.cache.get(host)
+        if entry is None:
+            return None
+        expires, rules = entry
+        if expires < time.monotonic():
+            del self.cache[host]
+            return None
+        return rules
+
+    def agent_of(self, crawler=None):
+        return self.user_agent or getattr(crawler, 'user_agent', None) or Robots.USER_AGENT
+
+    async def download(self, scheme, host, session, user_agent=USER_AGENT):
+        """ The rules and how long to keep them """
+        url = f'{scheme}://{host}/robots.txt'
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            headers = {'User-Agent': user_agent}
+            async with session.get(url, timeout=timeout, headers=headers, allow_redirects=True) as response:
+                if response.status >= 500:
+                    return RobotsRules.disallow_all(), self.error_ttl
+                if response.status >= 400:
+                    return RobotsRules.allow_all(), self.ttl
+                body = await response.content.read(self.max_size)
+                text = body.decode(response.charset or 'utf-8', errors='replace')
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, LookupError):
+            return RobotsRules.disallow_all(), self.error_ttl
+        return parse_robots(text, user_agent), self.ttl
+
+    async def rules_for(self, scheme, host, crawler=None):
+        rules = self.cached(host)
+        if rules is not None:
+            return rules
+
+        pending = self.pending.get(host)
+        if pending is not None:
+            return await pending
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[host] = future
+        try:
+            session = self.session or (await crawler.get_session() if crawler is not None else None)
+            if session is None:
+                raise ValueError(f"Robots: no session to fetch [host = {host}] with")
+            rules, ttl = await self.download(scheme, host, session, self.agent_of(crawler))
+            self.fetched += 1
+            self.cache[host] = (time.monotonic() + ttl, rules)
+            if crawler is not None:
+                crawler.say(f'Robots: [host = {host}] {rules}')
+                if rules.crawl_delay:
+                    crawler.queue_down.set_delay(host, rules.crawl_delay)
+            future.set_result(rules)
+            return rules
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            future.exception()  # mark it retrieved; the waiters, if any, get it raised
+            raise
+        finally:
+            del self.pending[host]
+
+    async def check(self, parts, crawler=None):
+        rules = await self.rules_for(parts.scheme, parts.netloc, crawler)
+        return self.verdict(rules, parts)
+
+    def verdict(self, rules, parts):
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+        allowed = rules.allowed(path)
+        if not allowed:
+            self.denied += 1
+        return allowed
+
+    def __call__(self, url, linked_by, crawler=None):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            return True
+        rules = self.cached(parts.netloc)
+        if rules is not None:
+            return self.verdict(rules, parts)
+        return self.check(parts, crawler)
+
+    def __str__(self):
+        return f'Robots: [user_agent = {self.agent_of()}] [hosts = {len(self.cache)}]' \
+               f' [fetched = {self.fetched}] [denied = {self.denied}]'
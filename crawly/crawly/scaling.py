@@ -0,0 +1,136 @@
+import asyncio
+
+
+class PoolBounds(object):
+    """ [minimum] and [maximum] workers of one kind """
+
+    def __init__(self, kind, minimum, maximum):
+        self.kind = kind
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def clamp(self, n):
+        return max(self.minimum, min(self.maximum, n))
+
+    def __str__(self):
+        return f'PoolBounds: [kind = {self.kind}] [minimum = {self.minimum}] [maximum = {self.maximum}]'
+
+
+class Autoscaler(object):
+    """ Grows and shrinks the crawler's worker pools while it runs.
+
+    Every [interval] seconds each configured pool is resized, AIMD style:
+
+        * congestion (downloaders only: an error rate over [error_rate],
+          or a fetch latency over [latency_factor] times the [baseline],
+          a slow moving average of it) cuts the pool to [decrease] of
+          its size,
+        * work waiting with no idle worker adds [increase] workers, unless
+          the queue the pool puts its results on is full already,
+        * more than half of the pool idle with no work waiting retires one.
+
+    Pools are configured as (minimum, maximum) pairs; a pool left out
+    keeps its fixed size:
+
+        Crawler(..., autoscaler=Autoscaler(downloaders=(2, 64), consumers=(1, 8)))
+    """
+
+    INTERVAL = 1.0
+    INCREASE = 1
+    DECREASE = 0.5
+    ERROR_RATE = 0.1
+    LATENCY_FACTOR = 2.0
+    BASELINE_WEIGHT = 0.1
+
+    def __init__(self, **kwargs):
+        self.interval = kwargs.pop('interval', Autoscaler.INTERVAL)
+        self.increase = kwargs.pop('increase', Autoscaler.INCREASE)
+        self.decrease = kwargs.pop('decrease', Autoscaler.DECREASE)
+        self.error_rate = kwargs.pop('error_rate', Autoscaler.ERROR_RATE)
+        self.latency_factor = kwargs.pop('latency_factor', Autoscaler.LATENCY_FACTOR)
+        self.baseline_weight = kwargs.pop('baseline_weight', Autoscaler.BASELINE_WEIGHT)
+
+        self.pools = {}
+        for kind in ('producer', 'downloader', 'consumer'):
+            bounds = kwargs.pop(f'{kind}s', None)
+            if bounds is not None:
+                self.pools[kind] = PoolBounds(kind, *bounds)
+
+        self.fetches = 0
+        self.errors = 0
+        self.baseline = None
+        self.resizes = 0
+
+    def congested(self, crawler):
+        """ True if the downloads of the last tick failed or slowed down too much """
+        fetches, self.fetches = crawler.fetches - self.fetches, crawler.fetches
+        errors, self.errors = crawler.errors - self.errors, crawler.errors
+        if not fetches:
+            return False
+
+        if errors / fetches > self.error_rate:
+            return True
+        latency = crawler.latency
+        if self.baseline is None:
+            self.baseline = latency
+        congested = latency > self.latency_factor * self.baseline
+        self.baseline += self.baseline_weight * (latency - self.baseline)
+        return congested
+
+    @staticmethod
+    def waiting(kind, crawler):
+        """ The number of items waiting for [kind] workers """
+        if kind == 'producer':
+            return crawler.queue_urls.qsize()
+        if kind == 'downloader':
+            return crawler.queue_down.qsize()
+        return crawler.queue.qsize()
+
+    @staticmethod
+    def blocked(kind, crawler):
+        """ True if the queue [kind] workers put their results on is full; more of them won't help """
+        if kind == 'downloader':
+            return crawler.queue.full()
+        if kind == 'consumer':
+            return crawler.queue_urls.full()
+        return False
+
+    def target(self, kind, crawler, congested=False):
+        bounds = self.pools[kind]
+        n = crawler.workers_of(kind)
+        if congested:
+            return bounds.clamp(int(n * self.decrease))
+
+        idle = crawler.idle_workers(kind)
+        waiting = self.waiting(kind, crawler)
+        if waiting and not idle and not self.blocked(kind, crawler):
+            return bounds.clamp(n + self.increase)
+        if not waiting and idle > n // 2:
+            return bounds.clamp(n - 1)
+        return bounds.clamp(n)
+
+    def resize(self, crawler):
+        congested = 'downloader' in self.pools and self.congested(crawler)
+        for kind in self.pools:
+            n = crawler.workers_of(kind)
+            target = self.target(kind, crawler, congested=congested and kind == 'downloader')
+            if target == n:
+                continue
+
+            crawler.say(f'Autoscaler: [{kind}s = {n} -> {target}] [congested = {congested}] [latency = {crawler.latency:.3f}] [baseline = {self.baseline or 0.0:.3f}]')
+            self.resizes += 1
+            for _ in range(target - n):
+                crawler.spawn(kind)
+            for _ in range(n - target):
+                crawler.retire(kind)
+
+    async def run(self, crawler):
+        crawler.say(f'{self}: start')
+        while not crawler.quit:
+            await asyncio.sleep(self.interval)
+            self.resize(crawler)
+        crawler.say(f'{self}: exit')
+
+    def __str__(self):
+        pools = ' '.join(f'[{kind}s = {bounds.minimum}..{bounds.maximum}]' for kind, bounds in self.pools.items())
+        return f'Autoscaler: [interval = {self.interval}] {pools} [resizes = {self.resizes}]'
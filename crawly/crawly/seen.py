@@ -0,0 +1,154 @@
+import hashlib
+import math
+
+import numpy
+
+
+def fingerprint(url: str) -> int:
+    """ 64-bit fingerprint of an url """
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
+
+
+class SeenStore(object):
+    """ Exact set of seen urls, kept as sorted 64-bit fingerprints.
+
+    New fingerprints go to a small insert buffer that is merged into the
+    sorted numpy array once it holds [buffer_size] entries. Two urls
+    only collide with a probability of about n^2 / 2^65. """
+
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.the_fingerprints = numpy.empty(0, dtype=numpy.uint64)
+        self.buffer = set()
+
+    def merge(self):
+        if not self.buffer:
+            return
+        merged = numpy.fromiter(self.buffer, dtype=numpy.uint64, count=len(self.buffer))
+        merged.sort()
+        positions = numpy.searchsorted(self.the_fingerprints, merged)
+        self.the_fingerprints = numpy.insert(self.the_fingerprints, positions, merged)
+        self.buffer.clear()
+
+    def contains_fingerprint(self, print_):
+        if print_ in self.buffer:
+            return True
+        # a plain int above 2**63 would make numpy promote the whole array
+        key = numpy.uint64(print_)
+        fingerprints = self.the_fingerprints
+        index = fingerprints.searchsorted(key)
+        return index < len(fingerprints) and fingerprints[index] == key
+
+    def add_fingerprint(self, print_):
+        """ Adds a fingerprint. Returns False if it was already seen """
+        if self.contains_fingerprint(print_):
+            return False
+        self.buffer.add(print_)
+        if len(self.buffer) >= self.buffer_size:
+            self.merge()
+        return True
+
+    def add(self, url: str):
+        return self.add_fingerprint(fingerprint(url))
+
+    def __contains__(self, url):
+        return self.contains_fingerprint(fingerprint(url))
+
+    def __len__(self):
+        return len(self.the_fingerprints) + len(self.buffer)
+
+    @property
+    def nbytes(self):
+        return self.the_fingerprints.nbytes
+
+    def __str__(self):
+        return f'SeenStore: [urls = {len(self)}] [buffer = {len(self.buffer)}] [nbytes = {self.nbytes}]'
+
+
+class BloomSeen(object):
+    """ Approximate set of seen urls.
+
+    Sized for [capacity] urls at a false positive rate of [error]. A
+    false positive makes a new url look seen; a seen url is never
+    reported as new. The bits can live in a caller's [buffer], e.g. a
+    shared memory block. """
+
+    def __init__(self, capacity=10_000_000, error=0.001, buffer=None):
+        self.capacity = capacity
+        self.error = error
+        self.n_bits = self.bits_for(capacity, error)
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        n_bytes = (self.n_bits + 7) // 8
+
+        if buffer is None:
+            self.bits = memoryview(bytearray(n_bytes))
+        else:
+            self.bits = memoryview(buffer).cast('B')[0:n_bytes]
+        self.count = 0
+
+    @staticmethod
+    def bits_for(capacity, error):
+        return max(8, int(-capacity * math.log(error) / (math.log(2) ** 2)))
+
+    @classmethod
+    def size_for(cls, capacity, error):
+        """ Bytes needed for the bits of a [capacity] / [error] filter """
+        return (cls.bits_for(capacity, error) + 7) // 8
+
+    def positions(self, print_):
+        # Kirsch-Mitzenmacher: k positions out of two 32-bit halves
+        low = print_ & 0xFFFFFFFF
+        high = print_ >> 32
+        return [(low + i * high) % self.n_bits for i in range(self.n_hashes)]
+
+    def contains_fingerprint(self, print_):
+        bits = self.bits
+        for position in self.positions(print_):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add_fingerprint(self, print_):
+        """ Adds a fingerprint. Returns False if it was (probably) already seen """
+        bits = self.bits
+        new = False
+        for position in self.positions(print_):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def add(self, url: str):
+        return self.add_fingerprint(fingerprint(url))
+
+    def __contains__(self, url):
+        return self.contains_fingerprint(fingerprint(url))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def __str__(self):
+        return f'BloomSeen: [urls = {self.count}] [n_bits = {self.n_bits}] [n_hashes = {self.n_hashes}]'
+
+
+class SeenAcceptor(object):
+    """ Acceptor that denies urls already in [store] """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else SeenStore()
+
+    def __call__(self, url, linked_by, crawler):
+        if self.store.add(url):
+            crawler.say(f'SeenAcceptor: [url: {url}][link: {linked_by}] not seen <- Adding')
+            return True
+        crawler.say(f'SeenAcceptor: [url: {url}][link: {linked_by}] seen. -> Skipping')
+        return False
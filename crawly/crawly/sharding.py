@@ -0,0 +1,306 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import multiprocessing
+import multiprocessing.shared_memory
+import os
+import queue
+import time
+import urllib.parse
+
+from crawly.seen import BloomSeen, SeenAcceptor
+
+
+def shard_of(host, n_shards):
+    """ The shard that owns [host]; the same in every process """
+    digest = hashlib.blake2b(host.encode('utf-8', errors='replace'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % n_shards
+
+
+class SharedSeen(object):
+    """ A Bloom filter per shard, all in one shared memory block.
+
+    Shard k only ever writes the filter of its own hosts, so there is a
+    single writer per filter and no lost updates between processes. The
+    other shards read it to skip forwarding links the owner has seen. """
+
+    def __init__(self, n_shards, capacity, error, name=None):
+        self.n_shards = n_shards
+        self.capacity = capacity
+        self.error = error
+        self.size = BloomSeen.size_for(capacity, error)
+        if name is None:
+            self.memory = multiprocessing.shared_memory.SharedMemory(create=True, size=self.size * n_shards)
+        else:
+            self.memory = multiprocessing.shared_memory.SharedMemory(name=name)
+        self.filters = [BloomSeen(capacity, error, buffer=self.memory.buf[k * self.size:(k + 1) * self.size])
+                        for k in range(n_shards)]
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def close(self):
+        for seen in self.filters:
+            seen.bits.release()
+        self.filters = []
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+    def __str__(self):
+        return f'SharedSeen: [name = {self.name}] [n_shards = {self.n_shards}] [bytes = {self.size * self.n_shards}]'
+
+
+class Sharder(object):
+    """ Keeps a shard's crawler on its own hosts.
+
+    As the crawler's [router], links of hosts owned by another shard are
+    taken out of the crawl and sent to that shard's inbox, in batches of
+    [batch_size] or every [flush_interval] seconds. Links the owner has
+    seen already are not sent at all. [receive] admits the links other
+    shards send here. """
+
+    BATCH_SIZE = 256
+    FLUSH_INTERVAL = 0.1
+
+    def __init__(self, shard, inboxes, seen: SharedSeen, **kwargs):
+        self.shard = shard
+        self.inboxes = inboxes
+        self.n_shards = len(inboxes)
+        self.seen = seen
+        self.batch_size = kwargs.pop('batch_size', Sharder.BATCH_SIZE)
+        self.flush_interval = kwargs.pop('flush_interval', Sharder.FLUSH_INTERVAL)
+
+        self.outboxes = [[] for _ in range(self.n_shards)]
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.owners = {}
+        self.sent = 0
+        self.received = 0
+        self.skipped = 0
+
+    def owner(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        owner = self.owners.get(host)
+        if owner is None:
+            owner = shard_of(host, self.n_shards)
+            self.owners[host] = owner
+        return owner
+
+    def __call__(self, records, crawler=None):
+        """ Use as a crawler [router]: the records this shard keeps """
+        kept = []
+        for record in records:
+            owner = self.owner(record[0])
+            if owner == self.shard:
+                kept.append(record)
+            elif record[0] in self.seen.filters[owner]:
+                self.skipped += 1
+            else:
+                outbox = self.outboxes[owner]
+                outbox.append(record)
+                if len(outbox) >= self.batch_size:
+                    self.send(owner)
+        return kept
+
+    def send(self, owner):
+        outbox = self.outboxes[owner]
+        if outbox:
+            self.inboxes[owner].put(outbox)
+            self.sent += len(outbox)
+            self.outboxes[owner] = []
+
+    def flush(self):
+        for owner in range(self.n_shards):
+            self.send(owner)
+
+    async def flush_loop(self, crawler):
+        while not crawler.quit:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    async def receive(self, crawler):
+        loop = asyncio.get_running_loop()
+        inbox = self.inboxes[self.shard]
+        while not crawler.quit:
+            records = await loop.run_in_executor(self.executor, inbox.get)
+            if records is None:
+                break
+            self.received += len(records)
+            await crawler.admit(records, wait=False)
+
+    def close(self):
+        """ Wakes up [receive] and lets go of its thread """
+        self.flush()
+        self.inboxes[self.shard].put(None)
+        self.executor.shutdown(wait=False)
+
+    def __str__(self):
+        return f'Sharder: [shard = {self.shard}/{self.n_shards}] [sent = {self.sent}]' \
+               f' [received = {self.received}] [skipped = {self.skipped}]'
+
+
+async def no_input(crawler):
+    pass
+
+
+async def report_loop(shard, sharder: Sharder, crawler, stats, interval):
+    while not crawler.quit:
+        await asyncio.sleep(interval)
+        stats.put(shard_stats(shard, sharder, crawler))
+
+
+def shard_stats(shard, sharder: Sharder, crawler, final=False):
+    idle = crawler.queue_urls.empty() and crawler.queue_down.empty() and crawler.queue.empty() \
+        and not len(crawler.backlog) and not crawler.held \
+        and crawler.idle_workers('downloader') == crawler.workers_of('downloader') \
+        and crawler.idle_workers('consumer') == crawler.workers_of('consumer')
+    return {
+        'shard': shard,
+        'pid': os.getpid(),
+        'fetches': crawler.fetches,
+        'errors': crawler.errors,
+        'sent': sharder.sent,
+        'received': sharder.received,
+        'skipped': sharder.skipped,
+        'idle': idle,
+        'final': final,
+    }
+
+
+def run_shard(shard, n_shards, seen_name, capacity, error, inboxes, stats, seeds, settings, setup=None):
+    """ The body of one shard process: a Crawler restricted to the hosts of [shard] """
+    import logging
+    from crawly.crawler import Crawler
+
+    seen = SharedSeen(n_shards, capacity, error, name=seen_name)
+    sharder = Sharder(shard, inboxes, seen)
+
+    kwargs = dict(settings)
+    kwargs.setdefault('input_loop', no_input)
+    kwargs.setdefault('log_filepath', f'shard-{shard}.log')
+    kwargs['inputs'] = seeds
+    kwargs['router'] = sharder
+    kwargs['acceptors'] = [SeenAcceptor(seen.filters[shard])] + list(kwargs.get('acceptors', []))
+    if setup is not None:
+        setup(shard, kwargs)
+
+    crawler = Crawler(**kwargs)
+    if kwargs.get('log_filepath') == os.devnull:
+        logging.disable(logging.INFO)
+    crawler.tasks.append(crawler.loop.create_task(sharder.receive(crawler)))
+    crawler.tasks.append(crawler.loop.create_task(sharder.flush_loop(crawler)))
+    crawler.tasks.append(crawler.loop.create_task(report_loop(shard, sharder, crawler, stats, Launcher.REPORT_INTERVAL)))
+    try:
+        crawler.start()
+    finally:
+        sharder.close()
+        stats.put(shard_stats(shard, sharder, crawler, final=True))
+        seen.close()
+
+
+class Launcher(object):
+    """ Runs [n_shards] crawler processes, each owning a hash partition of the hosts.
+
+    Links crossing shards go through per-shard inbox queues (see
+    [Sharder]); a [SharedSeen] filter in shared memory keeps shards
+    from sending each other links that were crawled already. The
+    launcher collects every shard's counters. The crawl ends after
+    [duration] seconds, or once every shard is idle with nothing in
+    flight between them. [settings] are Crawler keyword arguments; a
+    top level [setup](shard, kwargs) function can add handlers that
+    don't pickle. """
+
+    N_SHARDS = os.cpu_count() or 1
+    CAPACITY = 10_000_000
+    ERROR = 0.001
+    REPORT_INTERVAL = 0.5
+
+    def __init__(self, inputs, **kwargs):
+        self.inputs = list(inputs)
+        self.n_shards = kwargs.pop('n_shards', Launcher.N_SHARDS)
+        self.capacity = kwargs.pop('capacity', Launcher.CAPACITY)
+        self.error = kwargs.pop('error', Launcher.ERROR)
+        self.duration = kwargs.pop('duration', None)
+        self.setup = kwargs.pop('setup', None)
+        self.settings = kwargs.pop('settings', {})
+
+        self.context = multiprocessing.get_context('spawn')
+        self.processes = []
+        self.stats = {}
+
+    def seeds_of(self, shard):
+        return [url for url in self.inputs if shard_of(urllib.parse.urlsplit(url).netloc, self.n_shards) == shard]
+
+    @property
+    def totals(self):
+        totals = {}
+        for shard_stats_ in self.stats.values():
+            for name in ('fetches', 'errors', 'sent', 'received', 'skipped'):
+                totals[name] = totals.get(name, 0) + shard_stats_[name]
+        return totals
+
+    def finished(self):
+        """ Every shard idle, and every forwarded batch received """
+        if len(self.stats) < self.n_shards:
+            return False
+        totals = self.totals
+        return all(stats['idle'] for stats in self.stats.values()) and totals['sent'] == totals['received']
+
+    def collect(self, stats_queue, timeout):
+        try:
+            stats = stats_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.stats[stats['shard']] = stats
+        return stats
+
+    def run(self):
+        seen = SharedSeen(self.n_shards, self.capacity // self.n_shards, self.error)
+        inboxes = [self.context.Queue() for _ in range(self.n_shards)]
+        stats_queue = self.context.Queue()
+        begin = time.monotonic()
+        try:
+            for shard in range(self.n_shards):
+                process = self.context.Process(target=run_shard,
+                                               args=(shard, self.n_shards, seen.name, seen.capacity, seen.error,
+                                                     inboxes, stats_queue, self.seeds_of(shard), self.settings,
+                                                     self.setup))
+                # not a daemon: a shard has a parser pool of its own
+                process.start()
+                self.processes.append(process)
+
+            quiet_rounds = 0
+            while any(process.is_alive() for process in self.processes):
+                if self.duration is not None and time.monotonic() - begin >= self.duration:
+                    break
+                self.collect(stats_queue, Launcher.REPORT_INTERVAL)
+                quiet_rounds = quiet_rounds + 1 if self.finished() else 0
+                if quiet_rounds > 2 * self.n_shards:
+                    break
+        finally:
+            self.stop(stats_queue)
+            seen.close()
+            seen.unlink()
+        self.elapsed = time.monotonic() - begin
+        return self.totals
+
+    def stop(self, stats_queue):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()     # SIGTERM: the crawler shuts down cleanly
+        finals = 0
+        deadline = time.monotonic() + 10.0
+        while finals < len(self.processes) and time.monotonic() < deadline:
+            stats = self.collect(stats_queue, 0.5)
+            if stats is not None and stats['final']:
+                finals += 1
+        for process in self.processes:
+            process.join(1.0)
+            if process.is_alive():
+                process.kill()
+
+    def __str__(self):
+        totals = ' '.join(f'[{name} = {value}]' for name, value in self.totals.items())
+        return f'Launcher: [n_shards = {self.n_shards}] {totals}'
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import sqlite3
+
+
+class Sink(object):
+    """ Where a [SinkWriter] puts its batches of records """
+
+    def open(self):
+        pass
+
+    def write_many(self, records):
+        raise NotImplementedError(f"Interface! [crawly / sinks.py].Sink.write_many")
+
+    def close(self):
+        pass
+
+
+class TextSink(Sink):
+    """ One tab separated line per record, appended to [path] """
+
+    def __init__(self, path, buffering=64 * 1024):
+        self.path = path
+        self.buffering = buffering
+        self.file = None
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.path, 'a', buffering=self.buffering)
+
+    def write_many(self, records):
+        self.open()
+        lines = []
+        for record in records:
+            lines.append('\t'.join(str(field) if field is not None else '' for field in record).rstrip('\t'))
+            lines.append('\n')
+        self.file.write(''.join(lines))
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __str__(self):
+        return f'TextSink: [path = {self.path}]'
+
+
+class SQLiteSink(Sink):
+    """ Bulk inserts into a [table] of an SQLite database in WAL mode """
+
+    def __init__(self, path, table='visits', columns=('url', 'linked_by')):
+        self.path = path
+        self.table = table
+        self.columns = columns
+        self.connection = None
+
+    def open(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            columns = ', '.join(f'{column} TEXT' for column in self.columns)
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS {self.table} ({columns})')
+            self.connection.commit()
+
+    def write_many(self, records):
+        self.open()
+        marks = ', '.join('?' for _ in self.columns)
+        with self.connection:
+            self.connection.executemany(f'INSERT INTO {self.table} VALUES ({marks})', records)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __str__(self):
+        return f'SQLiteSink: [path = {self.path}] [table = {self.table}]'
+
+
+class SinkWriter(object):
+    """ The single task that owns a [Sink].
+
+    [put] only queues a record. The writer task flushes the queued
+    records to the sink in one batch once [batch_size] of them are
+    waiting or [flush_interval] seconds have passed. The sink is written
+    from an executor thread, so a slow disk does not stall the loop. A
+    batch that fails to write is logged and dropped, the writer goes on
+    with the next one, and [close] raises the first error. """
+
+    BATCH_SIZE = 1024
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, sink: Sink, **kwargs):
+        self.sink = sink
+        self.batch_size = kwargs.pop('batch_size', SinkWriter.BATCH_SIZE)
+        self.flush_interval = kwargs.pop('flush_interval', SinkWriter.FLUSH_INTERVAL)
+        self.queue = None
+        self.task = None
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.error = None
+
+    def start(self):
+        if self.task is None:
+            self.queue = asyncio.Queue()
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    def put(self, record):
+        self.start()
+        self.queue.put_nowait(record)
+
+    def put_many(self, records):
+        self.start()
+        for record in records:
+            self.queue.put_nowait(record)
+
+    def visit(self, url, linked_by, crawler):
+        """ Use as a crawler visitor """
+        self.put((url, linked_by))
+        return True
+
+    async def write(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self.sink.write_many, batch)
+        except Exception as error:
+            self.failed += len(batch)
+            self.error = self.error or error
+            logging.error(f'SinkWriter: [sink = {self.sink}] dropped {len(batch)} records: {error!r}')
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def drain(self, batch):
+        """ Adds what is queued to [batch]; True once it took the None that [close] queued,
+        which is left out, as is what follows it: that was put after closing """
+        while len(batch) < self.batch_size and not self.queue.empty():
+            record = self.queue.get_nowait()
+            if record is None:
+                return True
+            batch.append(record)
+        return False
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        stop = False
+        while not stop:
+            record = await self.queue.get()
+            if record is None:
+                break
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            stop = self.drain(batch)
+
+            while len(batch) < self.batch_size and not stop:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+                stop = self.drain(batch)
+
+            await self.write(batch)
+
+    async def close(self):
+        """ Writes out whatever is still queued and closes the sink. Raises the first error writing it, if any """
+        if self.task is not None:
+            self.queue.put_nowait(None)
+            await self.task
+            self.task = None
+        self.sink.close()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def __str__(self):
+        return f'SinkWriter: [sink = {self.sink}] [written = {self.written}] [batches = {self.batches}]' \
+               f' [failed = {self.failed}]'
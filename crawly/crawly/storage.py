@@ -0,0 +1,212 @@
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import os
+import sqlite3
+
+from crawly.downloader import Downloaded
+
+
+class ContentStore(object):
+    """ Downloads stored once per distinct body, under its content hash.
+
+    A body with digest 'ab12cd...' goes to [root]/objects/ab/12/ab12cd...;
+    [levels] directories of [width] hex characters spread the files out.
+    The url -> digest index lives in [root]/index.sqlite. The digests of
+    stored bodies are kept in memory, so a known body costs no stat and
+    no write at all, whichever url it came from.
+
+    The index is opened, and files and index rows are written, on a
+    thread of the store's own, in order, so a slow disk does not stall
+    the event loop. Once [max_pending] writes are queued [save] awaits
+    the oldest one. An error writing is logged and raised again by
+    [close]. [lookup] and [read] block until the queued writes are done;
+    they are for after the crawl.
+
+    An alternative to [save_download] / [mirror]:
+
+        store = ContentStore(output_path)
+        Crawler(..., download_handlers=[store.save_download], sinks=[store])
+    """
+
+    LEVELS = 2
+    WIDTH = 2
+    BATCH_SIZE = 256
+    MAX_PENDING = 256
+
+    def __init__(self, root, **kwargs):
+        self.root = os.path.abspath(root)
+        self.levels = kwargs.pop('levels', ContentStore.LEVELS)
+        self.width = kwargs.pop('width', ContentStore.WIDTH)
+        self.batch_size = kwargs.pop('batch_size', ContentStore.BATCH_SIZE)
+        self.max_pending = kwargs.pop('max_pending', ContentStore.MAX_PENDING)
+
+        self.connection = None
+        self.executor = None
+        self.writes = collections.deque()
+        self.error = None
+        self.digests = set()
+        self.directories = set()
+        self.pending_urls = []
+        self.pending_objects = []
+
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_written = 0
+        self.bytes_saved = 0
+
+    def open(self):
+        if self.connection is None:
+            os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+            self.connection = sqlite3.connect(os.path.join(self.root, 'index.sqlite'), check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS urls'
+                                    ' (url TEXT PRIMARY KEY, digest TEXT, content_type TEXT)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS objects'
+                                    ' (digest TEXT PRIMARY KEY, size INTEGER)')
+            self.connection.commit()
+            self.digests = {digest for digest, in self.connection.execute('SELECT digest FROM objects')}
+        return self.connection
+
+    def directory_of(self, digest):
+        parts = [digest[i * self.width:(i + 1) * self.width] for i in range(self.levels)]
+        return os.path.join(self.root, 'objects', *parts)
+
+    def path_of(self, digest):
+        return os.path.join(self.directory_of(digest), digest)
+
+    def write(self, digest, chunks):
+        directory = self.directory_of(digest)
+        if directory not in self.directories:
+            os.makedirs(directory, exist_ok=True)
+            self.directories.add(directory)
+
+        path = os.path.join(directory, digest)
+        partial = f'{path}.part'
+        try:
+            with open(partial, 'wb') as fd:
+                for chunk in chunks:
+                    fd.write(chunk)
+            os.replace(partial, path)
+        except OSError:
+            # not stored after all: the next body with this digest tries again
+            self.digests.discard(digest)
+            raise
+
+    def thread(self):
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='contentstore')
+        return self.executor
+
+    def submit(self, function, *args):
+        """ Runs [function] on the store's thread, after the writes queued before it """
+        while self.writes and self.writes[0].done():
+            self.check(self.writes.popleft())
+        write = self.thread().submit(function, *args)
+        self.writes.append(write)
+        return write
+
+    async def room(self):
+        """ Waits, without blocking the loop, while [max_pending] writes are queued """
+        while len(self.writes) >= self.max_pending:
+            oldest = self.writes[0]
+            await asyncio.wrap_future(oldest)
+            if self.writes and self.writes[0] is oldest:
+                self.check(self.writes.popleft())
+
+    def check(self, write: concurrent.futures.Future):
+        error = write.exception()
+        if error is not None:
+            logging.error(f'ContentStore: [root = {self.root}] write failed: {error!r}')
+            self.error = self.error or error
+
+    def wait(self):
+        """ Waits for every queued write """
+        while self.writes:
+            self.check(self.writes.popleft())
+
+    async def save(self, download: Downloaded):
+        """ Stores the body of [download] unless an identical one is stored already. Returns its digest """
+        if self.connection is None:
+            await asyncio.wrap_future(self.thread().submit(self.open))
+        digest = download.content_digest()
+        chunks = list(download.response.iter_content(chunk_size=download.chunk_size))
+        size = sum(len(chunk) for chunk in chunks)
+
+        if digest in self.digests:
+            self.deduplicated += 1
+            self.bytes_saved += size
+        else:
+            self.digests.add(digest)
+            await self.room()
+            self.submit(self.write, digest, chunks)
+            self.pending_objects.append((digest, size))
+            self.stored += 1
+            self.bytes_written += size
+
+        self.pending_urls.append((download.identity.url, digest, download.identity.content_type))
+        if len(self.pending_urls) >= self.batch_size:
+            self.flush()
+        return digest
+
+    async def save_download(self, download: Downloaded, crawler=None):
+        """ Use as a crawler download handler """
+        if download.identity.is_downloadable:
+            digest = await self.save(download)
+            if crawler is not None:
+                crawler.say(f'ContentStore/save_download: [url = {download.identity.url}] [digest = {digest}]')
+        return True
+
+    def write_index(self, objects, urls):
+        with self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO objects VALUES (?, ?)', objects)
+            self.connection.executemany('INSERT OR REPLACE INTO urls VALUES (?, ?, ?)', urls)
+
+    def flush(self):
+        """ Queues the pending index rows, behind the files they point to """
+        if self.connection is None or not (self.pending_objects or self.pending_urls):
+            return
+        self.submit(self.write_index, self.pending_objects, self.pending_urls)
+        self.pending_objects = []
+        self.pending_urls = []
+
+    def lookup(self, url):
+        """ The digest stored for [url], or None """
+        self.flush()
+        self.wait()
+        row = self.open().execute('SELECT digest FROM urls WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def read(self, url):
+        """ The stored body of [url], or None """
+        digest = self.lookup(url)
+        if digest is None:
+            return None
+        with open(self.path_of(digest), 'rb') as fd:
+            return fd.read()
+
+    def disconnect(self):
+        self.wait()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def close(self):
+        """ Writes out whatever is queued and closes the index; raises the first write error, if any """
+        self.flush()
+        await asyncio.get_running_loop().run_in_executor(None, self.disconnect)
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def __contains__(self, digest):
+        return digest in self.digests
+
+    def __str__(self):
+        return f'ContentStore: [root = {self.root}] [stored = {self.stored}]' \
+               f' [deduplicated = {self.deduplicated}] [bytes_saved = {self.bytes_saved}]'
@@ -1,6 +1,9 @@
 import asyncio
+import contextvars
 from typing import Any, Union, Collection, Dict, Coroutine
 
+from ioctools.fanout import FanOut
+
 
 class Callable:
     def __call__(self, *args, **kwargs):
@@ -8,22 +11,83 @@ class Callable:
 
 
 class Context:
-    """ Context for every RoutineIO call """
+    """ Context for every RoutineIO call.
+
+    A RoutineIO call takes one out of a free list with [acquire] and
+    gives it back with [release] once it returns, so a call allocates
+    no Context of its own after warm up.
+
+    A task started during the call copies the context variables, this
+    Context with them, and may read it after the call returned. [watch]
+    makes the loop mark the Context a task is started under as
+    [captured], and a captured Context is never pooled: [release] leaves
+    it as it is, to the garbage collector. """
 
-    def __init__(self, args=(), kwargs={}, result=None, error=None):
+    __slots__ = ('owner', 'args', 'kwargs', 'result', 'returns', 'error', 'captured')
+
+    POOL_SIZE = 1024
+    pool = []
+
+    def __init__(self, args=(), kwargs=None, result=None, error=None, owner=None):
+        self.owner = owner
         self.args = args
-        self.kwargs = kwargs
+        self.kwargs = kwargs if kwargs is not None else {}
         self.result = result
+        self.returns = None
         self.error = error
+        self.captured = False
+
+    @classmethod
+    def acquire(cls, owner, args, kwargs):
+        if cls.pool:
+            context = cls.pool.pop()
+            context.owner = owner
+            context.args = args
+            context.kwargs = kwargs
+            return context
+        return cls(args, kwargs, owner=owner)
+
+    def release(self):
+        if self.captured:
+            return
+        self.owner = self.result = self.returns = self.error = None
+        self.args = ()
+        self.kwargs = None
+        if len(Context.pool) < Context.POOL_SIZE:
+            Context.pool.append(self)
+
+    @staticmethod
+    def watch(loop):
+        """ Wraps the task factory of [loop], once, so every task started marks
+        the Context it copies as [captured] """
+        factory = loop.get_task_factory()
+        if getattr(factory, 'captures', False):
+            return
+
+        def capturing(loop, coro, **kwargs):
+            variables = kwargs.get('context')
+            context = variables.get(CURRENT) if variables is not None else CURRENT.get()
+            if context is not None:
+                context.captured = True
+            if factory is not None:
+                return factory(loop, coro, **kwargs)
+            return asyncio.Task(coro, loop=loop, **kwargs)
+
+        capturing.captures = True
+        loop.set_task_factory(capturing)
+
+
+# the Context of the RoutineIO call running in the current task
+CURRENT: contextvars.ContextVar = contextvars.ContextVar('ioctools.context', default=None)
 
 
 class Tasker(Callable):
     """ Base class that wraps a coroutine, a call context, and contains a asyncio.Task object """
 
-    def __init__(self, routine, context: Context = Context()):
+    def __init__(self, routine, context: Context = None):
         self.routine = routine
         self.subject = None
-        self.context = context
+        self.context = context if context is not None else Context()
 
     def __call__(self, *args, **kwargs):
         self.context.args = args
@@ -44,10 +108,11 @@ class Tasker(Callable):
 
     @classmethod
     async def gather(cls, *aws, loop=None, return_exceptions=False):
+        """ [loop] is ignored; asyncio.gather takes none any more """
         translated = [
             node.subject if isinstance(node, cls) else node for node in aws
         ]
-        return await asyncio.gather(*translated, loop, return_exceptions)
+        return await asyncio.gather(*translated, return_exceptions=return_exceptions)
 
 
 class CallableIO:
@@ -61,12 +126,31 @@ class CallableIO:
 
 
 class RoutineIO(CallableIO):
-    def __init__(self, context=Context(), coro=None, pause=None):
+    """ A coroutine with a Context per call.
+
+    Every call runs with a pooled Context of its own, found through a
+    context variable, so [args], [kwargs] and [result] are those of the
+    call asking for them and one instance can be called any number of
+    times at once. Outside of a call, [context] is the one given to the
+    constructor, e.g. for awaiting the instance directly. """
+
+    def __init__(self, context=None, coro=None, pause=None):
         super().__init__()
         self.coro = coro
-        self.context = context
+        self.context = context if context is not None else Context()
         self.pause = pause
 
+    @property
+    def context(self):
+        current = CURRENT.get()
+        if current is not None and current.owner is self:
+            return current
+        return self.default_context
+
+    @context.setter
+    def context(self, context):
+        self.default_context = context
+
     @property
     def args(self):
         return self.context.args
@@ -97,65 +181,177 @@ class RoutineIO(CallableIO):
         raise NotImplementedError(f"Interface! [ioctools / base.py].RoutineIO.routine")
 
     async def __call__(self, *args, **kwargs):
-        await self.prepare(*args, **kwargs)
-
-        if self.coro:
-            self.context.returns = await self.coro(*self.context.args, **self.context.kwargs)
-        else:
-            self.context.returns = await self.routine()
-        await self.finalize()
-
-        return self.context.returns
+        Context.watch(asyncio.get_running_loop())
+        context = Context.acquire(self, args, kwargs)
+        token = CURRENT.set(context)
+        try:
+            await self.prepare(*args, **kwargs)
+
+            if self.coro:
+                context.returns = await self.coro(*context.args, **context.kwargs)
+            else:
+                context.returns = await self.routine()
+            await self.finalize()
+
+            return context.returns
+        finally:
+            CURRENT.reset(token)
+            context.release()
 
     def __await__(self, *args, **kwargs):
         return self.__call__(*self.context.args, **self.context.kwargs).__await__()
 
 
 class SplitIO(RoutineIO):
-    """ Passes [self.args] and [self.kwargs] to many routines """
+    """ Passes [self.args] and [self.kwargs] to many routines, [limit] of them
+    at a time (None: all at once). Returns their results in order """
 
-    def __init__(self, *sub_routines):
+    def __init__(self, *sub_routines, limit=None):
         self.sub_routines = sub_routines
+        self.limit = limit
         super().__init__()
 
     async def routine(self):
-        tasks = []
-        for sub in self.sub_routines:
-            tasker = Task(routine=sub)
-            tasks.append(tasker(*self.args, **self.kwargs))
-        return await asyncio.gather(*tasks)
+        args, kwargs = self.args, self.kwargs
+        fan = FanOut(limit=self.limit or max(1, len(self.sub_routines)))
+        return await fan.map(lambda sub: sub(*args, **kwargs), self.sub_routines)
 
 
 class ComposeIO(RoutineIO):
-    """ Takes [n] Routines and chains them 
-    into a composition call with the last one taking 
-    the actual arguments. """
+    """ Takes [n] Routines and chains them
+    into a composition call with the last one taking
+    the actual arguments.
+
+    [stream] runs the composition over many inputs as a pipeline, every
+    stage busy with a different item at the same time. A stage makes up
+    to [concurrency] calls at once: one int for all of them, or one per
+    sub-routine in the order given. Neighbouring stages of the same
+    concurrency that aren't [isolated] are fused into one coroutine, with
+    no queue between them; an isolated stage runs every call in a task
+    of its own. """
 
-    def __init__(self, *sub_routines):
+    END = object()
+
+    def __init__(self, *sub_routines, concurrency=1, isolated=False):
         self.sub_routines = sub_routines
+        self.concurrency = concurrency
+        self.isolated = isolated
         super().__init__()
 
     async def routine(self):
         it = iter(reversed(self.sub_routines))
-        f = next(it)
-
-        f_tasker = Task(routine=f)
-        result = await asyncio.gather(f_tasker(*self.args,
-                                               **self.kwargs))
-
+        result = await next(it)(*self.args, **self.kwargs)
         for f in it:
-            f_tasker = Task(routine=f)
-            result = await asyncio.gather(f_tasker(result[0]))
+            result = await f(result)
         return result
 
+    def per_routine(self, value):
+        if isinstance(value, (list, tuple)):
+            if len(value) != len(self.sub_routines):
+                raise ValueError(f"ComposeIO: {len(value)} settings for {len(self.sub_routines)} sub-routines")
+            return list(value)
+        return [value] * len(self.sub_routines)
+
+    def stages(self):
+        """ (routines in the order they apply, concurrency, isolated) per stage of the pipeline """
+        concurrency = self.per_routine(self.concurrency)
+        isolated = self.per_routine(self.isolated)
+        stages = []
+        for i in reversed(range(len(self.sub_routines))):
+            if stages and not isolated[i] and not stages[-1][2] and stages[-1][1] == concurrency[i]:
+                stages[-1][0].append(self.sub_routines[i])
+            else:
+                stages.append(([self.sub_routines[i]], concurrency[i], isolated[i]))
+        return stages
+
+    async def feed(self, inputs, queue: asyncio.Queue, failures: asyncio.Queue):
+        """ Puts the inputs on the first queue, then the end. An error of the
+        inputs goes to [failures] for [stream] to raise """
+        index = 0
+        try:
+            if hasattr(inputs, '__aiter__'):
+                async for item in inputs:
+                    await queue.put((index, item))
+                    index += 1
+            else:
+                for item in inputs:
+                    await queue.put((index, item))
+                    index += 1
+        except Exception as error:
+            failures.put_nowait(error)
+        finally:
+            await queue.put(ComposeIO.END)
+
+    async def work(self, routines, isolated, queue_in: asyncio.Queue, queue_out: asyncio.Queue, running, failures):
+        while True:
+            entry = await queue_in.get()
+            if entry is ComposeIO.END:
+                running[0] -= 1
+                # the last worker of the stage passes the end on, the others leave it for their siblings
+                await (queue_out if not running[0] else queue_in).put(ComposeIO.END)
+                return
+            index, item = entry
+            try:
+                for routine in routines:
+                    item = await (Tasker(routine=routine)(item) if isolated else routine(item))
+            except Exception as error:
+                failures.put_nowait(error)
+                return
+            await queue_out.put((index, item))
+
+    async def stream(self, inputs, ordered=True):
+        """ Yields the composition of every item of [inputs], an iterable or async iterable.
+        With [ordered] in the order of the inputs, otherwise as they are done """
+        stages = self.stages()
+        queues = [asyncio.Queue(maxsize=2 * limit) for _, limit, _ in stages]
+        queues.append(asyncio.Queue())
+        failures = queues[-1]
+
+        tasks = [asyncio.create_task(self.feed(inputs, queues[0], failures))]
+        for i, (routines, limit, isolated) in enumerate(stages):
+            running = [limit]
+            for _ in range(limit):
+                tasks.append(asyncio.create_task(self.work(routines, isolated, queues[i], queues[i + 1],
+                                                           running, failures)))
+        try:
+            waiting, next_index = {}, 0
+            while True:
+                entry = await queues[-1].get()
+                if entry is ComposeIO.END:
+                    return
+                if isinstance(entry, Exception):
+                    raise entry
+                if not ordered:
+                    yield entry[1]
+                    continue
+                waiting[entry[0]] = entry[1]
+                while next_index in waiting:
+                    yield waiting.pop(next_index)
+                    next_index += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
 
 class LoopIO(RoutineIO):
-    """ Abstracts ASyncIO parallel loops."""
+    """ Abstracts ASyncIO parallel loops.
+
+    The [body] is awaited directly by default. With [isolated] every
+    call runs in a task of its own, e.g. for a body that has to be
+    cancelled apart from the loop or keeps its own contextvars.
+
+    A direct call that never has to wait doesn't give the event loop
+    back, so the loop yields to it every [yield_every] iterations. """
 
-    def __init__(self, body: Union[Callable, RoutineIO] = RoutineIO()):
+    YIELD_EVERY = 64
+
+    def __init__(self, body: Union[Callable, RoutineIO] = RoutineIO(), isolated=False, yield_every=YIELD_EVERY):
         super().__init__()
         self.to_quit = False
         self.body = body
+        self.isolated = isolated
+        self.yield_every = yield_every
 
     async def before(self):
         """ Called before the [self.body] call """
@@ -169,12 +365,19 @@ class LoopIO(RoutineIO):
         """ Implement this method to extract arguments for the [self.body] routine """
         return (), {}
 
+    async def call_body(self, *args, **kwargs):
+        if self.isolated:
+            return await Tasker(routine=self.body)(*args, **kwargs)
+        return await self.body(*args, **kwargs)
+
     async def routine(self):
+        iterations = 0
         while not self.to_quit:
             if await self.before():
                 args, kwargs = await self.generate_args()
-                tasker = Tasker(routine=self.body)
-                task = tasker(*args, **kwargs)
-                results = await asyncio.gather(task)
-                if not await self.after(results[0]):
+                result = await self.call_body(*args, **kwargs)
+                if not await self.after(result):
                     self.to_quit = True
+            iterations += 1
+            if not self.isolated and iterations % self.yield_every == 0:
+                await asyncio.sleep(0)
@@ -0,0 +1,151 @@
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from ioctools.base import RoutineIO
+from ioctools.queues import put_many, get_many
+
+
+EXECUTORS: Dict[Tuple[str, int], concurrent.futures.Executor] = {}
+
+
+def shared_executor(kind='thread', max_workers=None) -> concurrent.futures.Executor:
+    """ One executor per [kind] ('thread' or 'process') and size, for every stage that asks for it.
+    Process workers are spawned: forking a process that already runs threads can deadlock """
+    max_workers = max_workers or os.cpu_count() or 1
+    key = (kind, max_workers)
+    executor = EXECUTORS.get(key)
+    if executor is None:
+        if kind == 'thread':
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        elif kind == 'process':
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers,
+                                                           mp_context=multiprocessing.get_context('spawn'))
+        else:
+            raise ValueError(f"shared_executor: [kind = {kind}] is neither 'thread' nor 'process'")
+        EXECUTORS[key] = executor
+    return executor
+
+
+def shutdown_executors(wait=True):
+    for executor in EXECUTORS.values():
+        executor.shutdown(wait=wait)
+    EXECUTORS.clear()
+
+
+def run_chunk(function: Callable, items: List[Any]):
+    """ [function] over a chunk of items, in the executor. Returns (results, errors);
+    an error is (index in the chunk, repr of the exception), as exceptions may not pickle """
+    results, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            results.append(function(item))
+        except Exception as error:
+            errors.append((index, repr(error)))
+    return results, errors
+
+
+class ExecutorVectorIO(RoutineIO):
+    """ [VectorIO] for a synchronous [function]: it runs in an executor, off the event loop.
+
+    Items are taken in chunks of up to [chunk_size] and a whole chunk
+    goes to the executor in one call, which matters for a process pool
+    where every call pickles its arguments. Up to [max_pending] chunks
+    are in the executor at once, so a pool of n workers is kept busy by
+    a single ExecutorVectorIO. With [ordered], results reach [queue_out]
+    in the order their items came in; otherwise as soon as a chunk is
+    done. Items whose call raised are left out and counted in [errors].
+
+    [executor] is an Executor, or 'thread' / 'process' for the
+    [shared_executor] of that kind. """
+
+    CHUNK_SIZE = 16
+    MAX_PENDING = None      # 2 chunks per executor worker
+
+    def __init__(self,
+                 queue_in: asyncio.Queue,
+                 queue_out: asyncio.Queue = None,
+                 function: Callable = None,
+                 executor: Union[str, concurrent.futures.Executor] = 'thread',
+                 chunk_size=CHUNK_SIZE,
+                 ordered=True,
+                 max_pending=MAX_PENDING):
+        super().__init__()
+        self.queue_in = queue_in
+        self.queue_out = queue_out
+        self.function = function
+        self.executor = shared_executor(executor) if isinstance(executor, str) else executor
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        self.max_pending = max_pending or 2 * (getattr(self.executor, '_max_workers', None) or os.cpu_count() or 1)
+        self.to_quit = False
+        self.processed = 0
+        self.errors = 0
+
+    async def intake(self, pending: asyncio.Queue, slots: asyncio.Semaphore):
+        loop = asyncio.get_running_loop()
+        while not self.to_quit:
+            items = await get_many(self.queue_in, self.chunk_size)
+            await slots.acquire()
+            future = loop.run_in_executor(self.executor, run_chunk, self.function, items)
+            if self.ordered:
+                pending.put_nowait(future)
+            else:
+                future.add_done_callback(pending.put_nowait)
+
+    async def output(self, pending: asyncio.Queue, slots: asyncio.Semaphore):
+        while not self.to_quit:
+            future = await pending.get()
+            try:
+                results, errors = await future
+            finally:
+                slots.release()
+            for index, error in errors:
+                logging.warning(f'ExecutorVectorIO: [function = {self.function}] failed: {error}')
+            self.processed += len(results) + len(errors)
+            self.errors += len(errors)
+            if self.queue_out is not None and results:
+                await put_many(self.queue_out, results)
+
+    async def routine(self):
+        pending = asyncio.Queue()
+        slots = asyncio.Semaphore(self.max_pending)
+        tasks = [asyncio.create_task(self.intake(pending, slots)),
+                 asyncio.create_task(self.output(pending, slots))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __str__(self):
+        return f'ExecutorVectorIO: [function = {self.function}] [executor = {type(self.executor).__name__}]' \
+               f' [chunk_size = {self.chunk_size}] [ordered = {self.ordered}] [processed = {self.processed}]' \
+               f' [errors = {self.errors}]'
+
+
+class ExecutorConsumerIO(ExecutorVectorIO):
+    """ [ConsumerIO] for a synchronous [function] run in an executor; its results are dropped """
+
+    def __init__(self, queue: asyncio.Queue, function: Callable = None, **kwargs):
+        super().__init__(queue, None, function, **kwargs)
+
+
+class ThreadVectorIO(ExecutorVectorIO):
+    """ [ExecutorVectorIO] on the shared thread pool: for functions that let go of the GIL, e.g. hashing, zlib """
+
+    def __init__(self, queue_in, queue_out=None, function=None, max_workers=None, **kwargs):
+        super().__init__(queue_in, queue_out, function, executor=shared_executor('thread', max_workers), **kwargs)
+
+
+class ProcessVectorIO(ExecutorVectorIO):
+    """ [ExecutorVectorIO] on the shared process pool: for pure Python work, e.g. parsing.
+    [function] and the items have to pickle """
+
+    def __init__(self, queue_in, queue_out=None, function=None, max_workers=None, **kwargs):
+        super().__init__(queue_in, queue_out, function, executor=shared_executor('process', max_workers), **kwargs)
@@ -0,0 +1,128 @@
+import asyncio
+import contextlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Tuple
+
+
+class FanOut:
+    """ Calls an async function over many inputs, [limit] calls at a time.
+
+    Inputs are pulled from the iterable only as calls finish, so a list
+    of a million urls costs [limit] tasks, not a million. Every task
+    started by a FanOut is its own: an error or [cancel] cancels the
+    ones still running, and so does leaving an [as_completed] loop
+    early, once the stream is closed: by contextlib.aclosing or at the
+    end of the [async with]. Other than that, [async with] waits for
+    the tasks on the way out.
+
+        async with FanOut(limit=100) as fan:
+            async for index, page in fan.as_completed(fetch, urls):
+                ...
+            pages = await fan.map(fetch, urls)
+            mirrors = await fan.first(fetch, mirrors_of_url, n=1)
+    """
+
+    LIMIT = 64
+
+    def __init__(self, limit=LIMIT, return_exceptions=False):
+        self.limit = limit
+        self.return_exceptions = return_exceptions
+        self.tasks = set()
+        self.streams = []
+        self.started = 0
+        self.peak = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel()
+        for stream in self.streams:
+            await stream.aclose()
+        self.streams = []
+        await self.wait()
+
+    def spawn(self, function: Callable[..., Awaitable], item) -> asyncio.Task:
+        task = asyncio.create_task(function(item))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        self.started += 1
+        self.peak = max(self.peak, len(self.tasks))
+        return task
+
+    def cancel(self):
+        """ Cancels the calls still running """
+        for task in list(self.tasks):
+            task.cancel()
+
+    async def wait(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def as_completed(self, function: Callable[..., Awaitable], items: Iterable) -> AsyncIterator[Tuple[int, Any]]:
+        """ Yields (index of the item, result) as the calls finish. An exception is raised, cancelling
+        the other calls, unless [return_exceptions], which yields it as the result instead """
+        stream = self.stream(function, items)
+        self.streams.append(stream)
+        return stream
+
+    async def stream(self, function, items):
+        it = iter(enumerate(items))
+        running = {}
+
+        def refill():
+            while len(running) < self.limit:
+                try:
+                    index, item = next(it)
+                except StopIteration:
+                    return
+                running[self.spawn(function, item)] = index
+
+        refill()
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = running.pop(task)
+                    if task.cancelled():
+                        error = asyncio.CancelledError()
+                    else:
+                        error = task.exception()
+                    if error is not None and not self.return_exceptions:
+                        raise error
+                    result = error if error is not None else task.result()
+                    refill()
+                    yield index, result
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def map(self, function: Callable[..., Awaitable], items: Iterable) -> List[Any]:
+        """ The results of every call, in the order of [items] """
+        results = {}
+        async with contextlib.aclosing(self.stream(function, items)) as stream:
+            async for index, result in stream:
+                results[index] = result
+        return [results[index] for index in range(len(results))]
+
+    async def first(self, function: Callable[..., Awaitable], items: Iterable, n=1,
+                    success: Callable[[Any], bool] = None) -> List[Any]:
+        """ The first [n] results that are a [success] (no exception and, if given, [success](result) is true),
+        in the order they came. The calls still running then are cancelled. Fewer than [n] if the items run out """
+        found = []
+        fan = FanOut(self.limit, return_exceptions=True)
+        async with contextlib.aclosing(fan.stream(function, items)) as results:
+            async for _, result in results:
+                if isinstance(result, BaseException) or (success is not None and not success(result)):
+                    continue
+                found.append(result)
+                if len(found) >= n:
+                    break
+        self.started += fan.started
+        self.peak = max(self.peak, fan.peak)
+        return found
+
+    def __str__(self):
+        return f'FanOut: [limit = {self.limit}] [running = {len(self.tasks)}] [started = {self.started}] [peak = {self.peak}]'
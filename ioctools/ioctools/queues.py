@@ -0,0 +1,79 @@
+import asyncio
+from typing import Any, Collection, List
+
+
+class BatchQueue(asyncio.Queue):
+    """ asyncio.Queue that also moves items in lists.
+
+    [get_many] costs one wait at most, however many items it takes, so
+    a worker taking a list of items per iteration pays the scheduling
+    overhead once per list instead of once per item. [put_many] puts
+    the items that fit without waiting; on a full bounded queue it
+    waits once per item that doesn't fit, as [put] would. """
+
+    async def put_many(self, items: Collection[Any]):
+        """ Puts every item, waiting for room once per item that finds the queue full """
+        for item in items:
+            if self.full():
+                await self.put(item)
+            else:
+                self.put_nowait(item)
+
+    def put_many_nowait(self, items: Collection[Any]):
+        """ Puts as many items as fit. Returns how many did """
+        count = 0
+        for item in items:
+            if self.full():
+                break
+            self.put_nowait(item)
+            count += 1
+        return count
+
+    async def get_many(self, max_n: int, timeout: float = None) -> List[Any]:
+        """ Waits for an item, [timeout] seconds at most, then takes up to [max_n] of them without waiting.
+        An empty list means the timeout passed """
+        if self.empty():
+            try:
+                if timeout is None:
+                    first = await self.get()
+                else:
+                    first = await asyncio.wait_for(self.get(), timeout)
+            except asyncio.TimeoutError:
+                return []
+            items = [first]
+        else:
+            items = []
+        return self.get_many_nowait(max_n, items)
+
+    def get_many_nowait(self, max_n: int, items: List[Any] = None) -> List[Any]:
+        """ Up to [max_n] items, as many as there are now """
+        items = items if items is not None else []
+        while len(items) < max_n and not self.empty():
+            items.append(self.get_nowait())
+        return items
+
+    def task_done_many(self, count: int):
+        """ [task_done] for [count] items taken together """
+        for _ in range(count):
+            self.task_done()
+
+
+async def put_many(queue: asyncio.Queue, items: Collection[Any]):
+    """ [BatchQueue.put_many] for any asyncio.Queue """
+    if isinstance(queue, BatchQueue):
+        return await queue.put_many(items)
+    for item in items:
+        await queue.put(item)
+
+
+async def get_many(queue: asyncio.Queue, max_n: int, timeout: float = None) -> List[Any]:
+    """ [BatchQueue.get_many] for any asyncio.Queue """
+    if isinstance(queue, BatchQueue):
+        return await queue.get_many(max_n, timeout)
+    try:
+        items = [await asyncio.wait_for(queue.get(), timeout)]
+    except asyncio.TimeoutError:
+        return []
+    while len(items) < max_n and not queue.empty():
+        items.append(queue.get_nowait())
+    return items
@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Union
+
+from ioctools.base import LoopIO, RoutineIO
+from ioctools.executors import shared_executor
+from ioctools.queues import BatchQueue
+
+
+class Counters:
+    """ What one stage of a [Program] has done so far """
+
+    def __init__(self):
+        self.processed = 0
+        self.errors = 0
+        self.emitted = 0
+        self.stalls = 0
+        self.busy = 0
+        self.started = time.monotonic()
+        self.last_progress = self.started
+
+    def progress(self):
+        self.processed += 1
+        self.last_progress = time.monotonic()
+
+    @property
+    def rate(self):
+        """ Items per second since the program started """
+        elapsed = time.monotonic() - self.started
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return f'Counters: [processed = {self.processed}] [errors = {self.errors}] [emitted = {self.emitted}]' \
+               f' [busy = {self.busy}] [stalls = {self.stalls}] [rate = {self.rate:.1f}/s]'
+
+
+class Stage:
+    """ One step of a [Scheme]: [concurrency] workers calling [body] on the items of a queue of [queue_size].
+
+    The body is a RoutineIO or any async callable taking one item. What
+    it returns goes to the stage named [to], the next one by default;
+    None goes nowhere. With [fan_out] the body returns an iterable and
+    each of its items goes on separately. A [queue_size] of 0 is
+    unbounded. With an [executor] ('thread', 'process' or an Executor,
+    see ioctools.executors) the body is a plain function run there. """
+
+    CONCURRENCY = 1
+    QUEUE_SIZE = 64
+
+    def __init__(self, name, body: Union[Callable, RoutineIO], **kwargs):
+        self.name = name
+        self.body = body
+        self.concurrency = kwargs.pop('concurrency', Stage.CONCURRENCY)
+        self.queue_size = kwargs.pop('queue_size', Stage.QUEUE_SIZE)
+        self.to = kwargs.pop('to', None)
+        self.fan_out = kwargs.pop('fan_out', False)
+        self.isolated = kwargs.pop('isolated', False)
+        executor = kwargs.pop('executor', None)
+        self.executor = shared_executor(executor) if isinstance(executor, str) else executor
+
+    def __str__(self):
+        return f'Stage: [name = {self.name}] [concurrency = {self.concurrency}] [queue_size = {self.queue_size}]' \
+               f' [to = {self.to}] [fan_out = {self.fan_out}]'
+
+
+class Scheme:
+    """ Declares the stages of a pipeline, in order:
+
+        scheme = Scheme()
+        scheme.stage('download', fetch, concurrency=16, queue_size=64)
+        scheme.stage('parse', parse, concurrency=2, fan_out=True, to='download', queue_size=0)
+        program = Program(scheme)
+
+    A stage sending items back to an earlier one makes a cycle; give one
+    queue of the cycle no bound (queue_size=0), or the stages can end up
+    waiting on each other. """
+
+    def __init__(self, *stages: Stage):
+        self.stages: List[Stage] = []
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage: Stage):
+        if any(other.name == stage.name for other in self.stages):
+            raise ValueError(f"Scheme: a stage named [{stage.name}] is already there")
+        self.stages.append(stage)
+        return stage
+
+    def stage(self, name, body, **kwargs):
+        return self.add(Stage(name, body, **kwargs))
+
+    def targets(self):
+        """ stage name -> the name of the stage its results go to, or None """
+        names = [stage.name for stage in self.stages]
+        targets = {}
+        for i, stage in enumerate(self.stages):
+            if stage.to is not None and stage.to not in names:
+                raise ValueError(f"Scheme: [{stage.name}] sends to [{stage.to}], which is not a stage")
+            targets[stage.name] = stage.to or (names[i + 1] if i + 1 < len(names) else None)
+        return targets
+
+    def __str__(self):
+        return 'Scheme: [' + ' -> '.join(stage.name for stage in self.stages) + ']'
+
+
+class StageIO(LoopIO):
+    """ The worker of a [Stage]: takes an item, calls the body, hands the result on """
+
+    def __init__(self, program, stage: Stage):
+        super().__init__(body=stage.body, isolated=stage.isolated)
+        self.program = program
+        self.stage = stage
+        self.queue = program.queues[stage.name]
+        self.counters = program.counters[stage.name]
+        self.item = None
+
+    async def before(self):
+        self.item = await self.queue.get()
+        self.counters.busy += 1
+        return True
+
+    async def generate_args(self):
+        return (self.item,), {}
+
+    async def call_body(self, *args, **kwargs):
+        try:
+            if self.stage.executor is not None:
+                return await asyncio.get_running_loop().run_in_executor(self.stage.executor, self.body, *args)
+            return await super().call_body(*args, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            self.counters.errors += 1
+            self.program.failed(self.stage, self.item, error)
+            return None
+
+    async def after(self, result):
+        try:
+            if result is not None:
+                if self.stage.fan_out:
+                    for item in result:
+                        await self.program.emit(self.stage, item)
+                else:
+                    await self.program.emit(self.stage, result)
+        finally:
+            self.counters.busy -= 1
+            self.counters.progress()
+            self.queue.task_done()
+            self.program.done()
+        return True
+
+
+class Watchdog(RoutineIO):
+    """ Every [interval] seconds, reports the stages that have work but haven't finished an item for [timeout] """
+
+    INTERVAL = 1.0
+    TIMEOUT = 10.0
+
+    def __init__(self, program, interval=INTERVAL, timeout=TIMEOUT, on_stall=None):
+        super().__init__()
+        self.program = program
+        self.interval = interval
+        self.timeout = timeout
+        self.on_stall = on_stall
+        self.stalled = set()
+
+    def check(self):
+        """ The names of the stalled stages; [on_stall] is called once per stall """
+        now = time.monotonic()
+        stalled = set()
+        for stage in self.program.scheme.stages:
+            counters = self.program.counters[stage.name]
+            waiting = self.program.queues[stage.name].qsize() + counters.busy
+            if waiting and now - counters.last_progress >= self.timeout:
+                stalled.add(stage.name)
+                if stage.name not in self.stalled:
+                    counters.stalls += 1
+                    if self.on_stall is not None:
+                        self.on_stall(self.program, stage)
+                    else:
+                        logging.warning(f'Watchdog: [stage = {stage.name}] no progress for {now - counters.last_progress:.1f}s'
+                                        f' [waiting = {waiting}] {counters}')
+        self.stalled = stalled
+        return stalled
+
+    async def routine(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.check()
+
+
+class Program:
+    """ Runs a [Scheme]: the queues between the stages, their workers and a [Watchdog].
+
+        program = Program(scheme, stall_timeout=5.0)
+        program.start()
+        await program.put('download', url)
+        await program.join()    # every queue empty, no worker busy
+        await program.stop()
+        print(program.stats())
+    """
+
+    def __init__(self, scheme: Scheme, **kwargs):
+        self.scheme = scheme
+        self.targets = scheme.targets()
+        self.queues: Dict[str, BatchQueue] = {stage.name: BatchQueue(maxsize=stage.queue_size)
+                                              for stage in scheme.stages}
+        self.counters: Dict[str, Counters] = {stage.name: Counters() for stage in scheme.stages}
+        self.watchdog = Watchdog(self,
+                                 interval=kwargs.pop('watchdog_interval', Watchdog.INTERVAL),
+                                 timeout=kwargs.pop('stall_timeout', Watchdog.TIMEOUT),
+                                 on_stall=kwargs.pop('on_stall', None))
+        self.on_error = kwargs.pop('on_error', None)
+        self.tasks: List[asyncio.Task] = []
+        self.in_flight = 0      # items put or emitted and not done yet, over all the stages
+        self.drained = asyncio.Event()
+        self.drained.set()
+
+    def start(self):
+        if self.tasks:
+            return self.tasks
+        for counters in self.counters.values():
+            counters.started = counters.last_progress = time.monotonic()
+        for stage in self.scheme.stages:
+            for _ in range(stage.concurrency):
+                self.tasks.append(asyncio.create_task(StageIO(self, stage)()))
+        self.tasks.append(asyncio.create_task(self.watchdog()))
+        return self.tasks
+
+    def entered(self, count=1):
+        self.in_flight += count
+        self.drained.clear()
+
+    def done(self):
+        self.in_flight -= 1
+        if not self.in_flight:
+            self.drained.set()
+
+    async def put(self, name, item: Any):
+        """ Feeds [item] to the stage [name]; waits while its queue is full """
+        self.entered()
+        await self.queues[name].put(item)
+
+    async def put_many(self, name, items: Iterable[Any]):
+        for item in items:
+            await self.put(name, item)
+
+    async def emit(self, stage: Stage, item: Any):
+        target = self.targets[stage.name]
+        if target is not None:
+            self.counters[stage.name].emitted += 1
+            await self.put(target, item)
+
+    def failed(self, stage: Stage, item, error):
+        if self.on_error is not None:
+            self.on_error(self, stage, item, error)
+        else:
+            logging.warning(f'Program: [stage = {stage.name}] failed on [item = {item}]: {error!r}')
+
+    def idle(self):
+        return not self.in_flight
+
+    async def join(self):
+        """ Waits until every item fed in went through; items sent back to earlier stages included """
+        await self.drained.wait()
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def run(self, name, items: Iterable[Any]):
+        """ Feeds [items] to the stage [name], runs until all of it went through and stops """
+        self.start()
+        try:
+            await self.put_many(name, items)
+            await self.join()
+        finally:
+            await self.stop()
+        return self.stats()
+
+    def stats(self):
+        """ stage name -> counters and queue depth """
+        return {name: {'processed': counters.processed,
+                       'errors': counters.errors,
+                       'emitted': counters.emitted,
+                       'stalls': counters.stalls,
+                       'busy': counters.busy,
+                       'depth': self.queues[name].qsize(),
+                       'rate': counters.rate}
+                for name, counters in self.counters.items()}
+
+    def __str__(self):
+        return f'Program: {self.scheme} ' + ' '.join(f'[{name}: processed = {counters.processed},'
+                                                    f' depth = {self.queues[name].qsize()}]'
+                                                    for name, counters in self.counters.items())
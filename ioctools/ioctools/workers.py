@@ -1,13 +1,14 @@
 import asyncio
 from typing import Any, Union, Callable, Collection, Dict, Coroutine
 from ioctools.base import Tasker, LoopIO, CallableIO, RoutineIO, SplitIO, ComposeIO
+from ioctools.queues import BatchQueue, put_many, get_many
 
 
 # These two are the beginning points and ending points in your application scheme
 class ProducerIO(LoopIO):
     """ Feeds a queue with data out of [self.generate] RoutineIO """
-    def __init__(self, queue: asyncio.Queue = asyncio.Queue(), generate=RoutineIO()):
-        super().__init__(body=generate)
+    def __init__(self, queue: asyncio.Queue = asyncio.Queue(), generate=RoutineIO(), isolated=False):
+        super().__init__(body=generate, isolated=isolated)
         self.queue = queue
         
     async def after(self, result):
@@ -17,8 +18,8 @@ class ProducerIO(LoopIO):
 
 class ConsumerIO(LoopIO):
     """ Consumes an item from the queue. Check out [ProducerIO] """
-    def __init__(self, queue: asyncio.Queue = asyncio.Queue(), consume=RoutineIO()):
-        super().__init__(body=consume)
+    def __init__(self, queue: asyncio.Queue = asyncio.Queue(), consume=RoutineIO(), isolated=False):
+        super().__init__(body=consume, isolated=isolated)
         self.item = None
         self.queue = queue
 
@@ -36,17 +37,16 @@ class VectorIO(LoopIO):
     def __init__(self,
                  queue_in: asyncio.Queue = asyncio.Queue(),
                  queue_out: asyncio.Queue = asyncio.Queue(),
-                 process=RoutineIO()):
-        super().__init__(body=process)
+                 process=RoutineIO(),
+                 isolated=False):
+        super().__init__(body=process, isolated=isolated)
         self.queue_in = queue_in
         self.queue_out = queue_out
         self.item = None
 
     async def before(self):
-        try:
-            self.item = self.queue_in.get_nowait()
-        except asyncio.QueueEmpty:
-            self.item = 0
+        """ Waits for the next item """
+        self.item = await self.queue_in.get()
         return True
 
     async def generate_args(self):
@@ -59,6 +59,43 @@ class VectorIO(LoopIO):
         return True
 
 
+class BatchVectorIO(LoopIO):
+    """ [VectorIO] over lists: the body gets up to [batch_size] items at once
+    and returns a list of results, which all go to [queue_out].
+
+    Waits for items [timeout] seconds at most before trying again; None
+    waits as long as it takes. A body result of None puts nothing. """
+
+    BATCH_SIZE = 64
+
+    def __init__(self,
+                 queue_in: asyncio.Queue = None,
+                 queue_out: asyncio.Queue = None,
+                 process=RoutineIO(),
+                 batch_size=BATCH_SIZE,
+                 timeout=None,
+                 isolated=False):
+        super().__init__(body=process, isolated=isolated)
+        self.queue_in = queue_in if queue_in is not None else BatchQueue()
+        self.queue_out = queue_out if queue_out is not None else BatchQueue()
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.items = []
+
+    async def before(self):
+        self.items = await get_many(self.queue_in, self.batch_size, self.timeout)
+        return bool(self.items)
+
+    async def generate_args(self):
+        return (self.items,), {}
+
+    async def after(self, result):
+        if result is not None:
+            await put_many(self.queue_out, result)
+        self.items = []
+        return True
+
+
 class Worker:
     def __init__(self, count, routine=RoutineIO()):
         self.routine = routine
@@ -1,7 +1,7 @@
 from ioctools.www.url import Url
 from ioctools.www.html import Parser
 import aiohttp
-from ioctools.www.handlers import ChunkHandler, TextHandler, Handle
+from ioctools.www.handlers import BinaryHandler, TextHandler, Handle
 
 
 class Client:
@@ -12,14 +12,13 @@ class Client:
         self.chunk_size = chunk_size
         self.text_handlers = text_handlers
         self.binary_handlers = binary_handlers
-        self.handle = Handle(text_handlers, binary_handlers)
+        self.handle = Handle(text_handlers)
 
     async def request(self, method, url, **kwargs):
         links = []
         try:
             async with self.session_pool.place(url) as session:
                 async with session.request(method=method, url=str(url), **kwargs) as response:
-                    handle = Handle(self.text_handlers, self.binary_handlers)
                     links = await self.handle(url, response)
         except RuntimeError as error:
             print(f"RuntimeError: {url}; {error}")
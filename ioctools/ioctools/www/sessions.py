@@ -1,18 +1,162 @@
+import asyncio
 import aiohttp
 from ioctools.www.url import Url
 
 
-class SessionPool:
+class PoolStats:
+    """ Counts requests and how many of them went over a reused connection """
+
     def __init__(self):
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.sessions_created = 0
+        self.sessions_evicted = 0
+
+    @property
+    def reuse_ratio(self):
+        connections = self.connections_created + self.connections_reused
+        return self.connections_reused / connections if connections else 0.0
+
+    def __str__(self):
+        return f"PoolStats: [requests = {self.requests}]" \
+               f" [connections_created = {self.connections_created}]" \
+               f" [connections_reused = {self.connections_reused}]" \
+               f" [reuse_ratio = {self.reuse_ratio:.2f}]" \
+               f" [sessions_created = {self.sessions_created}]" \
+               f" [sessions_evicted = {self.sessions_evicted}]"
+
+
+class Placement:
+    """ Lends a pooled session for one request. Leaves it open on exit. """
+
+    def __init__(self, pool, netloc):
+        self.pool = pool
+        self.netloc = netloc
+
+    async def __aenter__(self):
+        # evicting first: an error closing an idle session must not cost a slot of [limit]
+        await self.pool.evict_idle()
+        await self.pool.limit.acquire()
+        try:
+            return self.pool.borrow(self.netloc)
+        except BaseException:
+            self.pool.limit.release()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            self.pool.give_back(self.netloc)
+        finally:
+            self.pool.limit.release()
+
+
+class SessionPool:
+    """ Keeps one keep-alive session per netloc for the whole crawl.
+
+    [limit] caps the requests in flight over all hosts, [limit_per_host]
+    the connections to a single netloc. Sessions not used for
+    [idle_timeout] seconds are closed. """
+
+    LIMIT = 100
+    LIMIT_PER_HOST = 8
+    IDLE_TIMEOUT = 60.0
+    KEEPALIVE_TIMEOUT = 30.0
+    DNS_TTL = 300
+
+    def __init__(self,
+                 limit=LIMIT,
+                 limit_per_host=LIMIT_PER_HOST,
+                 idle_timeout=IDLE_TIMEOUT,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT,
+                 dns_ttl=DNS_TTL,
+                 **session_kwargs):
         self.netloc_sessions = {}
+        self.netloc_used = {}
+        self.netloc_busy = {}
+        self.limit_per_host = limit_per_host
+        self.idle_timeout = idle_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self.session_kwargs = session_kwargs
+        self.limit = asyncio.Semaphore(limit)
+        self.stats = PoolStats()
+        self.trace = self.make_trace()
+        self.next_eviction = 0.0
+
+    def make_trace(self):
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.stats.requests += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.stats.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.stats.connections_reused += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    def make_session(self):
+        connector = aiohttp.TCPConnector(limit=self.limit_per_host,
+                                         limit_per_host=self.limit_per_host,
+                                         keepalive_timeout=self.keepalive_timeout,
+                                         use_dns_cache=True,
+                                         ttl_dns_cache=self.dns_ttl)
+        self.stats.sessions_created += 1
+        return aiohttp.ClientSession(connector=connector,
+                                     trace_configs=[self.trace],
+                                     **self.session_kwargs)
 
     def place(self, url: Url):
-        parsed = url.parsed
-        print(f"parsed.netloc: {url.parsed.netloc}")
-
-        if True:  # parsed.netloc not in self.netloc_sessions:
-            session = aiohttp.ClientSession()
-            self.netloc_sessions[parsed.netloc] = session
-        else:
-            session = self.netloc_sessions[parsed.netloc]
+        return Placement(self, url.parsed.netloc)
+
+    def borrow(self, netloc):
+        session = self.netloc_sessions.get(netloc)
+        if session is None or session.closed:
+            session = self.make_session()
+            self.netloc_sessions[netloc] = session
+        self.netloc_busy[netloc] = self.netloc_busy.get(netloc, 0) + 1
         return session
+
+    def give_back(self, netloc):
+        busy = self.netloc_busy.get(netloc)
+        if busy is None:
+            # the pool was closed while the session was out
+            return
+        self.netloc_busy[netloc] = busy - 1
+        self.netloc_used[netloc] = asyncio.get_running_loop().time()
+
+    async def evict_idle(self):
+        now = asyncio.get_running_loop().time()
+        if now < self.next_eviction:
+            return
+        self.next_eviction = now + self.idle_timeout / 2
+
+        for netloc, used in list(self.netloc_used.items()):
+            if self.netloc_busy.get(netloc) or now - used < self.idle_timeout:
+                continue
+            session = self.netloc_sessions.pop(netloc, None)
+            # [close] may have cleared them while an earlier session was closing
+            self.netloc_used.pop(netloc, None)
+            self.netloc_busy.pop(netloc, None)
+            if session is not None:
+                await session.close()
+                self.stats.sessions_evicted += 1
+
+    async def close(self):
+        sessions = list(self.netloc_sessions.values())
+        self.netloc_sessions.clear()
+        self.netloc_used.clear()
+        self.netloc_busy.clear()
+        await asyncio.gather(*[session.close() for session in sessions], return_exceptions=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,61 @@
+""" Items per second through one VectorIO stage, one item per body call vs. lists of them.
+
+N items wait in the input queue; the stage runs until all of their
+results are in the output queue. The body is trivial, so what is
+measured is the per-call overhead of the loop.
+
+    python -m playgrounds.batching [n_items] [batch sizes...]
+"""
+import asyncio
+import sys
+import time
+
+from ioctools.base import RoutineIO
+from ioctools.queues import BatchQueue
+from ioctools.workers import VectorIO, BatchVectorIO
+
+
+class Increment(RoutineIO):
+    async def routine(self):
+        return self.args[0] + 1
+
+
+class IncrementMany(RoutineIO):
+    async def routine(self):
+        return [item + 1 for item in self.args[0]]
+
+
+async def drain(stage, queue_in, queue_out, n_items):
+    queue_in.put_many_nowait(range(n_items))
+    begin = time.perf_counter()
+    task = asyncio.create_task(stage())
+    while queue_out.qsize() < n_items:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - begin
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return n_items / elapsed
+
+
+async def per_item(n_items):
+    queue_in, queue_out = BatchQueue(), BatchQueue()
+    return await drain(VectorIO(queue_in, queue_out, Increment()), queue_in, queue_out, n_items)
+
+
+async def batched(n_items, batch_size):
+    queue_in, queue_out = BatchQueue(), BatchQueue()
+    stage = BatchVectorIO(queue_in, queue_out, IncrementMany(), batch_size=batch_size)
+    return await drain(stage, queue_in, queue_out, n_items)
+
+
+async def main(n_items, batch_sizes):
+    print(f'{"VectorIO":>20}: [items/sec = {await per_item(n_items):12.0f}]')
+    for batch_size in batch_sizes:
+        rate = await batched(n_items, batch_size)
+        print(f'{f"BatchVectorIO({batch_size})":>20}: [items/sec = {rate:12.0f}]')
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sizes = [int(size) for size in sys.argv[2:]] or [1, 8, 64, 512]
+    asyncio.run(main(count, sizes))
@@ -0,0 +1,70 @@
+""" ComposeIO one call per input vs. ComposeIO.stream over all of them.
+
+Three stages that each wait [delay] seconds, like a fetch, a parse and
+a store: called one input at a time the latencies add up; streamed,
+the stages overlap, and with concurrency every stage has several
+items in hand. The last runs time three cheap stages, fused into one
+coroutine vs. each isolated in its own task.
+
+    python -m playgrounds.compose [n_inputs] [delay]
+"""
+import asyncio
+import sys
+import time
+
+from ioctools.base import ComposeIO, RoutineIO
+
+
+class Wait(RoutineIO):
+    def __init__(self, delay, add):
+        super().__init__()
+        self.delay = delay
+        self.add = add
+
+    async def routine(self):
+        value = self.args[0]
+        await asyncio.sleep(self.delay)
+        return value + self.add
+
+
+class Add(RoutineIO):
+    def __init__(self, add):
+        super().__init__()
+        self.add = add
+
+    async def routine(self):
+        return self.args[0] + self.add
+
+
+async def timed(name, n, run):
+    begin = time.perf_counter()
+    results = await run()
+    elapsed = time.perf_counter() - begin
+    correct = results == [i + 111 for i in range(n)]
+    print(f'{name:>32}: [items/sec = {n / elapsed:10.1f}] [seconds = {elapsed:6.2f}] [correct = {correct}]')
+
+
+async def main(n, delay):
+    def waits(**kwargs):
+        return ComposeIO(Wait(delay, 100), Wait(delay, 10), Wait(delay, 1), **kwargs)
+
+    async def per_call():
+        formula = waits()
+        return [await formula(i) for i in range(n)]
+
+    async def streamed(formula, inputs):
+        return [result async for result in formula.stream(inputs)]
+
+    await timed('one call per input', n, per_call)
+    await timed('stream, 1 per stage', n, lambda: streamed(waits(isolated=True), range(n)))
+    await timed('stream, 8 per stage', n, lambda: streamed(waits(concurrency=8, isolated=True), range(n)))
+
+    m = n * 100
+    await timed('fused cheap stages', m, lambda: streamed(ComposeIO(Add(100), Add(10), Add(1)), range(m)))
+    await timed('isolated cheap stages', m,
+                lambda: streamed(ComposeIO(Add(100), Add(10), Add(1), isolated=True), range(m)))
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 0.005))
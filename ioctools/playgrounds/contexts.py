@@ -0,0 +1,99 @@
+""" One RoutineIO called many times at once, vs. the old work around of an instance per call.
+
+Reports whether every call saw its own arguments, how many Context
+objects were built per call, the peak traced memory of a burst of
+concurrent calls and calls per second one after the other. Last,
+whether tasks a call started still see its arguments after it returned.
+
+    python -m playgrounds.contexts [n_calls]
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from ioctools.base import Context, RoutineIO
+
+
+class Echo(RoutineIO):
+    async def routine(self):
+        await asyncio.sleep(0)      # another call runs in between
+        return self.args[0], self.kwargs.get('tag')
+
+
+class Spawner(RoutineIO):
+    """ Starts a task that reads [args] once the call is over """
+
+    def __init__(self):
+        super().__init__()
+        self.children = []
+
+    async def routine(self):
+        async def child():
+            await asyncio.sleep(0.001)
+            return self.args[0]
+        self.children.append(asyncio.create_task(child()))
+        return self.args[0]
+
+
+class Counted:
+    """ Counts the Context objects built while active """
+
+    def __init__(self):
+        self.built = 0
+        self.init = Context.__init__
+
+    def __enter__(self):
+        counter = self
+
+        def init(context, *args, **kwargs):
+            counter.built += 1
+            counter.init(context, *args, **kwargs)
+
+        Context.__init__ = init
+        return self
+
+    def __exit__(self, *exc):
+        Context.__init__ = self.init
+
+
+async def burst(call, n):
+    with Counted() as counted:
+        tracemalloc.start()
+        results = await asyncio.gather(*(call(i) for i in range(n)))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    correct = results == [(i, -i) for i in range(n)]
+    return correct, counted.built / n, peak
+
+
+async def sequential(call, n):
+    with Counted() as counted:
+        begin = time.perf_counter()
+        for i in range(n):
+            await call(i)
+        elapsed = time.perf_counter() - begin
+    return n / elapsed, counted.built / n
+
+
+async def main(n):
+    shared = Echo()
+    ways = (('one shared instance', lambda i: shared(i, tag=-i)),
+            ('an instance per call', lambda i: Echo()(i, tag=-i)))
+    for name, call in ways:
+        await sequential(call, 1000)    # warm up the pool
+        correct, built, peak = await burst(call, n)
+        rate, built_sequential = await sequential(call, n)
+        print(f'{name:>20}: [correct = {correct}] [peak memory = {peak / 2**20:5.1f} MB]'
+              f' [contexts built per call: concurrent = {built:.2f}, sequential = {built_sequential:.2f}]'
+              f' [calls/sec = {rate:9.0f}]')
+
+    spawner = Spawner()
+    for i in range(100):
+        await spawner(i)
+    seen = await asyncio.gather(*spawner.children)
+    print(f'{"spawned tasks":>20}: [correct = {seen == list(range(100))}]')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
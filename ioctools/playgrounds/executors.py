@@ -0,0 +1,78 @@
+""" CPU bound work in a pipeline: on the event loop vs. the executor-backed workers.
+
+Every item is compressed with zlib and hashed. While it runs, a ticker
+task measures how late the event loop wakes it up: on the loop the
+other workers wait for every body, in an executor they don't. Process
+pools only beat threads with several cores; zlib and hashlib let go of
+the GIL, so threads help for this body too.
+
+    python -m playgrounds.executors [n_items] [item_size]
+"""
+import asyncio
+import hashlib
+import sys
+import time
+import zlib
+
+from ioctools.base import RoutineIO
+from ioctools.executors import ThreadVectorIO, ProcessVectorIO, shutdown_executors
+from ioctools.queues import BatchQueue
+from ioctools.workers import VectorIO
+
+
+def digest(data: bytes):
+    return hashlib.blake2b(zlib.compress(data, 6), digest_size=16).hexdigest()
+
+
+class Digest(RoutineIO):
+    async def routine(self):
+        return digest(self.args[0])
+
+
+async def ticker(lags, interval=0.005):
+    while True:
+        begin = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - begin - interval)
+
+
+async def measure(make_stage, items):
+    queue_in, queue_out = BatchQueue(), BatchQueue()
+    queue_in.put_many_nowait(items)
+    lags = []
+    tick = asyncio.create_task(ticker(lags))
+    begin = time.perf_counter()
+    stage = asyncio.create_task(make_stage(queue_in, queue_out)())
+    while queue_out.qsize() < len(items):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - begin
+    for task in (stage, tick):
+        task.cancel()
+    await asyncio.gather(stage, tick, return_exceptions=True)
+    results = queue_out.get_many_nowait(len(items))
+    return len(items) / elapsed, max(lags, default=0.0), results
+
+
+async def main(n_items, item_size):
+    items = [bytes([i % 251]) * item_size for i in range(n_items)]
+    expected = [digest(item) for item in items]
+
+    stages = [('on the loop', lambda q_in, q_out: VectorIO(q_in, q_out, Digest()))]
+    for chunk_size in (1, 16, 64):
+        stages.append((f'threads, chunks of {chunk_size}',
+                       lambda q_in, q_out, c=chunk_size: ThreadVectorIO(q_in, q_out, digest, chunk_size=c)))
+        stages.append((f'processes, chunks of {chunk_size}',
+                       lambda q_in, q_out, c=chunk_size: ProcessVectorIO(q_in, q_out, digest, chunk_size=c)))
+
+    try:
+        for name, make_stage in stages:
+            rate, lag, results = await measure(make_stage, items)
+            print(f'{name:>24}: [items/sec = {rate:9.0f}] [worst loop lag = {lag * 1000:6.1f} ms]'
+                  f' [in order = {results == expected}]')
+    finally:
+        shutdown_executors()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 64 * 1024))
@@ -0,0 +1,79 @@
+""" Fanning out many simulated fetches: everything at once vs. a bounded FanOut.
+
+    python -m playgrounds.fanout [n_fetches] [limit]
+"""
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+
+from ioctools.base import RoutineIO, SplitIO
+from ioctools.fanout import FanOut
+
+
+class Open:
+    """ Simulated sockets: how many fetches are running at once """
+
+    def __init__(self):
+        self.now = 0
+        self.peak = 0
+
+    async def fetch(self, url):
+        self.now += 1
+        self.peak = max(self.peak, self.now)
+        try:
+            await asyncio.sleep(random.uniform(0.001, 0.01))
+            if url.endswith('7'):
+                raise ConnectionError(url)
+            return f'<html>{url}</html>'
+        finally:
+            self.now -= 1
+
+
+async def run(name, fan_out, n):
+    urls = (f'http://example.com/{i}' for i in range(n))
+    sockets = Open()
+    tracemalloc.start()
+    begin = time.perf_counter()
+    results = await fan_out(sockets.fetch, urls)
+    elapsed = time.perf_counter() - begin
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    failed = sum(1 for result in results if isinstance(result, BaseException))
+    print(f'{name:>12}: [seconds = {elapsed:5.2f}] [open at once = {sockets.peak:6d}]'
+          f' [peak memory = {peak_memory / 2**20:6.1f} MB] [failed = {failed}]')
+
+
+async def everything(fetch, urls):
+    return await asyncio.gather(*(fetch(url) for url in urls), return_exceptions=True)
+
+
+async def main(n, limit):
+    await run('gather all', everything, n)
+    await run(f'FanOut({limit})', FanOut(limit, return_exceptions=True).map, n)
+
+    sockets = Open()
+    begin = time.perf_counter()
+    fan = FanOut(limit)
+    first = await fan.first(sockets.fetch, (f'http://mirror-{i}.example.com/7' if i % 2 else
+                                            f'http://mirror-{i}.example.com/1' for i in range(n)), n=3)
+    print(f'{"first 3":>12}: [seconds = {time.perf_counter() - begin:5.2f}] [started = {fan.started}]'
+          f' [found = {len(first)}]')
+
+    class Greet(RoutineIO):
+        def __init__(self, greeting):
+            super().__init__()
+            self.greeting = greeting
+
+        async def routine(self):
+            await asyncio.sleep(0.01)
+            return f'{self.greeting}, {self.args[0]}'
+
+    split = SplitIO(*(Greet(greeting) for greeting in ('Hello', 'Hi', 'Hey', 'Howdy')), limit=2)
+    print(f'{"SplitIO":>12}: {await split("world")}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 100))
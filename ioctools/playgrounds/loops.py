@@ -0,0 +1,72 @@
+""" Iterations per second of the LoopIO workers, body awaited directly vs. in a task per call.
+
+    python -m playgrounds.loops [n_iterations]
+"""
+import asyncio
+import sys
+import time
+
+from ioctools.base import RoutineIO
+from ioctools.workers import ProducerIO, ConsumerIO, VectorIO
+
+
+class Constant(RoutineIO):
+    async def routine(self):
+        return 1
+
+
+class Increment(RoutineIO):
+    async def routine(self):
+        return self.args[0] + 1
+
+
+class Count(RoutineIO):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    async def routine(self):
+        self.count += 1
+
+
+async def run_until(stage, done):
+    begin = time.perf_counter()
+    task = asyncio.create_task(stage())
+    while not done():
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - begin
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return elapsed
+
+
+async def producer(n, isolated):
+    queue = asyncio.Queue()
+    return await run_until(ProducerIO(queue, Constant(), isolated=isolated), lambda: queue.qsize() >= n)
+
+
+async def consumer(n, isolated):
+    queue, count = asyncio.Queue(), Count()
+    for i in range(n):
+        queue.put_nowait(i)
+    return await run_until(ConsumerIO(queue, count, isolated=isolated), lambda: count.count >= n)
+
+
+async def vector(n, isolated):
+    queue_in, queue_out = asyncio.Queue(), asyncio.Queue()
+    for i in range(n):
+        queue_in.put_nowait(i)
+    return await run_until(VectorIO(queue_in, queue_out, Increment(), isolated=isolated),
+                           lambda: queue_out.qsize() >= n)
+
+
+async def main(n):
+    for name, run in (('ProducerIO', producer), ('ConsumerIO', consumer), ('VectorIO', vector)):
+        direct = n / await run(n, False)
+        isolated = n / await run(n, True)
+        print(f'{name:>10}: [direct = {direct:10.0f} it/sec] [isolated = {isolated:10.0f} it/sec]'
+              f' [speedup = {direct / isolated:.1f}x]')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
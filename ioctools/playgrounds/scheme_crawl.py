@@ -0,0 +1,83 @@
+""" crawly's producer -> downloader -> consumer chain as an ioctools [Scheme].
+
+    accept      drops urls seen before or off the start host      (crawly: producer)
+    download    fetches a page                                     (crawly: downloader)
+    parse       pulls the links out, back to accept one by one     (crawly: consumer)
+
+parse -> accept closes the cycle, so accept's queue has no bound; the
+others are bounded and push back on the stage before them. Prints the
+stage counters every second and when the crawl has nothing left.
+
+    python -m playgrounds.scheme_crawl URL [max_pages]
+"""
+import asyncio
+import sys
+
+import aiohttp
+
+from ioctools.base import RoutineIO
+from ioctools.schemes import Scheme, Program
+from ioctools.www.html import Parser
+from ioctools.www.url import Url, makeurl
+
+
+class Accept(RoutineIO):
+    def __init__(self, host, max_pages):
+        super().__init__()
+        self.host = host
+        self.max_pages = max_pages
+        self.seen = set()
+
+    async def routine(self):
+        url: Url = self.args[0]
+        if url.parsed.netloc != self.host or url in self.seen or len(self.seen) >= self.max_pages:
+            return None
+        self.seen.add(url)
+        return url
+
+
+class Download(RoutineIO):
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+
+    async def routine(self):
+        url: Url = self.args[0]
+        async with self.session.get(url.url) as response:
+            if response.status >= 400 or 'html' not in response.headers.get('Content-Type', ''):
+                return None
+            return url, await response.read()
+
+
+class Parse(RoutineIO):
+    async def routine(self):
+        url, body = self.args[0]
+        return [makeurl(url, link) for link in Parser(body).urls if link]
+
+
+async def report(program):
+    while True:
+        await asyncio.sleep(1.0)
+        print(program)
+
+
+async def main(start, max_pages):
+    start = Url(start)
+    async with aiohttp.ClientSession() as session:
+        scheme = Scheme()
+        scheme.stage('accept', Accept(start.parsed.netloc, max_pages), queue_size=0)
+        scheme.stage('download', Download(session), concurrency=16, queue_size=64)
+        scheme.stage('parse', Parse(), concurrency=2, queue_size=16, fan_out=True, to='accept')
+
+        program = Program(scheme, stall_timeout=5.0)
+        reporter = asyncio.create_task(report(program))
+        stats = await program.run('accept', [start])
+        reporter.cancel()
+
+    for name, counters in stats.items():
+        print(f'{name:>10}: ' + ' '.join(f'[{key} = {value:.1f}]' if isinstance(value, float) else f'[{key} = {value}]'
+                                         for key, value in counters.items()))
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 1000))